@@ -94,13 +94,13 @@ with target_periods as (
 )
 select
   upper(p.ticker) as ticker,
-  upper(p.cusip) as cusip
+  p.cusip as cusip
 from public.positions p
 join public.filings f on f.id = p.filing_id
 where (p.ticker is not null or p.cusip is not null)
   and f.report_period in (select report_period from target_periods)
-group by upper(p.ticker), upper(p.cusip)
-order by upper(p.ticker), upper(p.cusip);
+group by upper(p.ticker), p.cusip
+order by upper(p.ticker), p.cusip;
 `;
 
   const raw = runPsql(sql);
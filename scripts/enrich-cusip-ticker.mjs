@@ -50,13 +50,13 @@ function isValidTicker(value) {
 
 function fetchDistinctCusips() {
   const raw = runPsql(`
-select upper(p.cusip)
+select p.cusip
 from public.positions p
 join public.filings f on f.id = p.filing_id
 where p.cusip is not null
   and f.filing_form_type in ('13F-HR','13F-HR/A')
-group by upper(p.cusip)
-order by upper(p.cusip);
+group by p.cusip
+order by p.cusip;
 `);
 
   if (!raw) {
@@ -0,0 +1,5 @@
+"""Identity and sector enrichment jobs for 13F holdings.
+
+Run ``python3 -m enrichment <command>`` from ``scripts/``. Importing this
+package is cheap: command modules and yfinance load only when needed.
+"""
@@ -0,0 +1,415 @@
+"""Candidate selection SQL over the shared enrichment snapshot tables."""
+
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .db import iter_psql_rows, run_psql, run_psql_script, sql_literal
+from .models import Candidate, CandidateSecurity, TickerCandidate
+from .settings import (
+    BATCH_SIZE,
+    CANDIDATE_CHUNK_SIZE,
+    REVALIDATE_TIERS,
+    SECTOR_TTL_DAYS,
+    UNIVERSE_QUARTERS,
+    UNIVERSE_TOP_N,
+)
+
+
+# ``held`` is one row per (filer, CUSIP); ``candidates`` is one row per CUSIP.
+UNIVERSE_CTE_SQL = """
+held as (
+  select h.cusip, h.issuer_name, h.value_usd_thousands
+  from public.enrichment_candidate_holdings h
+  join public.enrichment_candidate_institutions ci on ci.institution_id = h.institution_id
+  where {universe_filter}{shard_filter}{earlier_quarters}
+), candidates as (
+  select cusip, max(issuer_name) as issuer_name, sum(value_usd_thousands) as value_usd_thousands
+  from held
+  group by cusip
+)"""
+
+# Earlier filings add CUSIPs a filer has since sold; value tiers still come
+# from the latest filing, so those CUSIPs land in the lowest tier. The window
+# is counted in quarter starts: subtracting months from a month-end such as
+# 06-30 lands on the 30th and would let one quarter too many in.
+EARLIER_QUARTERS_SQL = """
+  union all
+  select p.cusip, p.issuer_name, 0
+  from public.enrichment_candidate_institutions ci
+  join public.filings f
+    on f.institution_id = ci.institution_id
+   and f.filing_form_type in ('13F-HR', '13F-HR/A')
+   and f.report_period < ci.report_period
+   and f.report_period >= date_trunc('quarter', ci.report_period) - interval '{months} months'
+  join public.positions p on p.filing_id = f.id
+  where {universe_filter}{shard_filter}"""
+
+UNIVERSE_CUSIPS_SQL = """
+with {universe}
+select
+  c.cusip,
+  c.issuer_name,
+  coalesce(c.value_usd_thousands, 0) as value_usd_thousands,
+  {last_checked} as last_checked_at
+from candidates c
+left join public.security_identity_map sim
+  on sim.cusip = c.cusip
+ and sim.is_active = true
+left join public.enrichment_lookup_attempts la
+  on la.cusip = c.cusip
+where {stale_filter}
+"""
+
+# When a CUSIP was last looked at: confirmed or, failing that, attempted.
+# greatest() ignores nulls, so only never-tried CUSIPs sort as null.
+LAST_CHECKED_SQL = "greatest(sim.last_verified_at, la.last_attempt_at)"
+
+# (index, count) pair selecting one hash partition of the CUSIP space.
+Shard = Tuple[int, int]
+
+
+def shard_filter_sql(column: str, shard: Optional[Shard]) -> str:
+    if shard is None:
+        return ""
+    index, count = shard
+    # hashtext is stable across sessions and hosts, so every shard process
+    # agrees on the partition without coordinating.
+    return f"\n  and ((hashtext({column})::bigint % {count}) + {count}) % {count} = {index}"
+
+
+def stale_identity_sql(verified_column: str, value_column: str) -> str:
+    """Predicate for identities due a re-check under ``REVALIDATE_TIERS``.
+
+    Unmapped CUSIPs (null ``verified_column``) are always due.
+    """
+    if not REVALIDATE_TIERS:
+        return "true"
+    cases = "\n".join(
+        f"      when {value_column} >= {value!r} then interval '{days:g} days'"
+        for value, days in REVALIDATE_TIERS
+    )
+    return (
+        f"({verified_column} is null\n"
+        f"  or {verified_column} < timezone('utc', now()) - case\n"
+        f"{cases}\n"
+        f"      else interval '{REVALIDATE_TIERS[-1][1]:g} days'\n"
+        "    end)"
+    )
+
+
+def sector_reverify_sql(verified_column: str) -> str:
+    """Predicate for unchanged sector rows whose verification stamp should move.
+
+    Only stamps older than ``SECTOR_TTL_DAYS`` move, so reruns inside the TTL
+    write nothing; with a TTL of 0 nothing reads the stamp and it never moves.
+    """
+    if SECTOR_TTL_DAYS <= 0:
+        return "false"
+    return f"{verified_column} < timezone('utc', now()) - interval '{SECTOR_TTL_DAYS:g} days'"
+
+
+def sector_due_sql(ticker_column: str, cusip_column: str) -> str:
+    """Predicate for mapped identities with no usable active sector row.
+
+    Catches sector lookups that failed (timeout, 429, stop) after the identity
+    was stamped, which the identity tiers alone would leave for weeks. A row
+    matched on the ticker or the CUSIP counts, as in
+    ``fetch_fresh_sector_tickers``; past ``SECTOR_TTL_DAYS`` it is due again.
+    """
+    fresh = ""
+    if SECTOR_TTL_DAYS > 0:
+        fresh = (
+            "\n        and ssm.last_verified_at >= timezone('utc', now())"
+            f" - interval '{SECTOR_TTL_DAYS:g} days'"
+        )
+    return (
+        f"({ticker_column} is not null\n"
+        "    and not exists (\n"
+        "      select 1 from public.security_sector_map ssm\n"
+        f"      where ssm.is_active = true and ssm.ticker = {ticker_column}{fresh}\n"
+        "    )\n"
+        "    and not exists (\n"
+        "      select 1 from public.security_sector_map ssm\n"
+        f"      where ssm.is_active = true and ssm.cusip = {cusip_column}{fresh}\n"
+        "    ))"
+    )
+
+
+def describe_universe() -> str:
+    filers = "all" if UNIVERSE_TOP_N is None else f"top:{UNIVERSE_TOP_N}"
+    return f"{filers}, quarters={UNIVERSE_QUARTERS}"
+
+
+def universe_cte_sql(shard: Optional[Shard] = None) -> str:
+    """``held``/``candidates`` CTEs for the YH_UNIVERSE filers over YH_UNIVERSE_QUARTERS."""
+    universe_filter = (
+        "true" if UNIVERSE_TOP_N is None else f"ci.canonical_rank <= {UNIVERSE_TOP_N}"
+    )
+    earlier_quarters = ""
+    if UNIVERSE_QUARTERS > 1:
+        earlier_quarters = EARLIER_QUARTERS_SQL.format(
+            months=3 * (UNIVERSE_QUARTERS - 1),
+            universe_filter=universe_filter,
+            shard_filter=shard_filter_sql("p.cusip", shard),
+        )
+    return UNIVERSE_CTE_SQL.format(
+        universe_filter=universe_filter,
+        shard_filter=shard_filter_sql("h.cusip", shard),
+        earlier_quarters=earlier_quarters,
+    )
+
+
+def universe_cusips_sql(shard: Optional[Shard] = None) -> str:
+    stale_filter = stale_identity_sql("sim.last_verified_at", "c.value_usd_thousands")
+    if REVALIDATE_TIERS:
+        stale_filter = f"({stale_filter}\n  or {sector_due_sql('sim.ticker', 'c.cusip')})"
+    return UNIVERSE_CUSIPS_SQL.format(
+        universe=universe_cte_sql(shard),
+        last_checked=LAST_CHECKED_SQL,
+        stale_filter=stale_filter,
+    )
+
+
+def ensure_candidate_snapshot() -> None:
+    # Snapshot is refreshed by refresh-latest-portfolios/refresh-whale-snapshots;
+    # only build it here when it has never been populated. The advisory lock
+    # keeps concurrent shard processes from building it twice.
+    run_psql_script(
+        """
+begin;
+select pg_advisory_xact_lock(hashtext('enrichment_candidate_snapshot'));
+select case
+  when exists (select 1 from public.enrichment_candidate_institutions) then null
+  else public.refresh_enrichment_candidate_snapshot()
+end;
+commit;
+"""
+    )
+
+
+def count_universe_cusips(shard: Optional[Shard] = None) -> int:
+    ensure_candidate_snapshot()
+    raw = run_psql(f"select count(*) from ({universe_cusips_sql(shard)}) candidates;")
+    return int(raw or "0")
+
+
+def iter_universe_cusips(shard: Optional[Shard] = None) -> Iterator[Candidate]:
+    """Yield due candidates one ``CANDIDATE_CHUNK_SIZE`` page per short query.
+
+    Never-tried CUSIPs come first, then the longest-unchecked, so SYMBOL_LIMIT
+    runs spread revalidation across days instead of re-checking everything
+    nightly. Failed lookups are stamped in enrichment_lookup_attempts, so
+    unresolvable CUSIPs queue behind stale identities instead of ahead of them.
+
+    Pages are keyset-paged on the sort key rather than read from one cursor,
+    so no statement or snapshot stays open while a chunk is looked up. Rows
+    checked after the run started are skipped, so rows this run stamps (or
+    failed to resolve) are not picked up again at the end of it.
+    """
+    ensure_candidate_snapshot()
+    run_started = run_psql("select now();").strip()
+    sort_key = "coalesce(u.last_checked_at, '-infinity'), -u.value_usd_thousands, u.cusip"
+    after = ""
+    while True:
+        sql = f"""
+select u.cusip, u.issuer_name, coalesce(u.last_checked_at, '-infinity'), u.value_usd_thousands
+from ({universe_cusips_sql(shard)}) u
+where (u.last_checked_at is null or u.last_checked_at < {sql_literal(run_started)}){after}
+order by {sort_key}
+limit {CANDIDATE_CHUNK_SIZE};
+"""
+        rows = list(iter_psql_rows(sql, 4))
+        for cusip, issuer_name, _, _ in rows:
+            c = cusip.strip().upper()
+            if c:
+                yield Candidate(cusip=c, issuer_name=issuer_name.strip())
+        if len(rows) < CANDIDATE_CHUNK_SIZE:
+            return
+        checked_at, value, last_cusip = rows[-1][2], rows[-1][3], rows[-1][0]
+        after = (
+            f"\n  and ({sort_key}) > ("
+            f"{sql_literal(checked_at)}::timestamptz, -{sql_literal(value)}::numeric, "
+            f"{sql_literal(last_cusip)})"
+        )
+
+
+def iter_universe_ticker_candidates() -> Iterator[TickerCandidate]:
+    # A ticker is due when any of its CUSIPs is stale; all of its CUSIPs are
+    # returned so a dead ticker is replaced everywhere at once. Oldest first,
+    # where a dead ticker with no replacement counts as checked when last tried.
+    ensure_candidate_snapshot()
+    sql = f"""
+with {universe_cte_sql()}, rows as (
+  select
+    c.cusip,
+    upper(trim(sim.ticker)) as ticker,
+    c.issuer_name,
+    {LAST_CHECKED_SQL} as last_checked_at,
+    {stale_identity_sql("sim.last_verified_at", "c.value_usd_thousands")} as stale
+  from candidates c
+  join public.security_identity_map sim
+    on sim.cusip = c.cusip
+   and sim.is_active = true
+  left join public.enrichment_lookup_attempts la
+    on la.cusip = c.cusip
+  where sim.ticker ~ '^[A-Za-z.]{{1,10}}$'
+), by_ticker as (
+  select
+    r.*,
+    bool_or(r.stale) over (partition by r.ticker) as ticker_stale,
+    min(r.last_checked_at) over (partition by r.ticker) as ticker_checked_at
+  from rows r
+)
+select cusip, ticker, issuer_name
+from by_ticker
+where ticker_stale
+order by ticker_checked_at asc nulls first, ticker, cusip;
+"""
+    for cusip, ticker, issuer_name in iter_psql_rows(sql, 3):
+        cusip = cusip.strip()
+        ticker = ticker.strip()
+        if cusip and ticker:
+            yield TickerCandidate(
+                cusip=cusip, ticker=ticker, issuer_name=issuer_name.strip()
+            )
+
+
+def iter_target_ticker_candidates(target_ticker: str) -> Iterator[TickerCandidate]:
+    sql = f"""
+select
+  sim.cusip,
+  sim.ticker,
+  coalesce(max(p.issuer_name), sim.ticker) as issuer_name
+from public.security_identity_map sim
+left join public.positions p
+  on p.cusip = sim.cusip
+where sim.is_active = true
+  and sim.ticker = {sql_literal(target_ticker)}
+group by sim.cusip, sim.ticker;
+"""
+    for cusip, ticker, issuer_name in iter_psql_rows(sql, 3):
+        cusip = cusip.strip()
+        ticker = ticker.strip()
+        if cusip and ticker:
+            yield TickerCandidate(
+                cusip=cusip, ticker=ticker, issuer_name=issuer_name.strip()
+            )
+
+
+def iter_unresolved_securities(stats: Dict[str, int]) -> Iterator[CandidateSecurity]:
+    # Mapped/unmapped filtering and CUSIP -> ticker resolution run in SQL so the
+    # active sector and identity maps never have to be loaded into Python.
+    # Summary counts are written into ``stats`` as their rows stream past.
+    ensure_candidate_snapshot()
+    sql = """
+with candidates as (
+  select h.ticker, h.cusip
+  from public.enrichment_candidate_holdings h
+  group by h.ticker, h.cusip
+), unresolved as (
+  select c.ticker, c.cusip
+  from candidates c
+  where not exists (
+      select 1
+      from public.security_sector_map ssm
+      where ssm.is_active = true
+        and c.ticker is not null
+        and ssm.ticker = c.ticker
+    )
+    and not exists (
+      select 1
+      from public.security_sector_map ssm
+      where ssm.is_active = true
+        and c.cusip is not null
+        and ssm.cusip = c.cusip
+    )
+)
+select 'stats', 'candidates', count(*)::text from candidates
+union all
+select 'stats', 'mapped_tickers', count(distinct ticker)::text
+from public.security_sector_map
+where is_active = true and ticker is not null
+union all
+select 'stats', 'mapped_cusips', count(distinct cusip)::text
+from public.security_sector_map
+where is_active = true and cusip is not null
+union all
+select 'row', coalesce(u.ticker, sim.ticker), u.cusip
+from unresolved u
+left join public.security_identity_map sim
+  on u.ticker is null
+ and sim.cusip = u.cusip
+ and sim.is_active = true;
+"""
+    for kind, first, second in iter_psql_rows(sql, 3):
+        if kind == "stats":
+            stats[first] = int(second or "0")
+        elif kind == "row":
+            yield CandidateSecurity(
+                ticker=first.strip().upper() or None,
+                cusip=second.strip() or None,
+            )
+
+
+def fetch_replaceable_cusips(
+    cusips: List[str], old_ticker: str, replacement: str
+) -> List[str]:
+    # Conflict check runs in SQL so only this ticker's CUSIPs cross the wire.
+    if not cusips:
+        return []
+    values_sql = ", ".join(f"({sql_literal(cusip)})" for cusip in cusips)
+    sql = f"""
+select c.cusip
+from (values {values_sql}) as c(cusip)
+left join public.security_identity_map sim
+  on sim.cusip = c.cusip
+ and sim.is_active = true
+where sim.ticker is null
+   or upper(sim.ticker) in ({sql_literal(old_ticker)}, {sql_literal(replacement)})
+order by c.cusip;
+"""
+    raw = run_psql(sql)
+    return [line.strip() for line in raw.splitlines() if line.strip()]
+
+
+def fetch_fresh_sector_tickers(rows: List[Tuple[str, str]]) -> Set[str]:
+    """Return tickers of (ticker, cusip) rows whose active sector was checked within the TTL.
+
+    A mapping on either the ticker or the CUSIP counts, matching how sector
+    rows are upserted. The two matches are separate branches so each can use
+    its own index; an ``or`` across both columns can use neither. ``SECTOR_TTL_DAYS`` of 0 treats every mapping as stale.
+    """
+    if not rows or SECTOR_TTL_DAYS <= 0:
+        return set()
+
+    inserts = []
+    for start in range(0, len(rows), BATCH_SIZE):
+        values_sql = ",\n  ".join(
+            f"({sql_literal(ticker)}, {sql_literal(cusip)})"
+            for ticker, cusip in rows[start : start + BATCH_SIZE]
+        )
+        inserts.append(f"insert into sector_lookup (ticker, cusip) values\n  {values_sql};")
+
+    sql = f"""
+create temp table sector_lookup (ticker text not null, cusip text not null);
+{chr(10).join(inserts)}
+select l.ticker
+from sector_lookup l
+where exists (
+  select 1
+  from public.security_sector_map ssm
+  where ssm.is_active = true
+    and ssm.ticker = l.ticker
+    and ssm.last_verified_at >= timezone('utc', now()) - interval '{SECTOR_TTL_DAYS:g} days'
+)
+union
+select l.ticker
+from sector_lookup l
+where exists (
+  select 1
+  from public.security_sector_map ssm
+  where ssm.is_active = true
+    and ssm.cusip = l.cusip
+    and ssm.last_verified_at >= timezone('utc', now()) - interval '{SECTOR_TTL_DAYS:g} days'
+);
+"""
+    return {line.strip() for line in run_psql_script(sql).splitlines() if line.strip()}
@@ -0,0 +1,52 @@
+import argparse
+import importlib
+import sys
+from typing import List, Optional
+
+
+# Subcommand -> module under enrichment.commands, imported only when selected.
+COMMANDS = {
+    "identity": ("identity", "Resolve CUSIPs to tickers and refresh their sectors."),
+    "sectors": ("sectors", "Classify unmapped candidate securities into GICS sectors."),
+    "ticker-refresh": ("ticker_refresh", "Replace dead tickers on active identities."),
+    "worker": ("worker", "Claim and run queued identity, sector and liveness jobs."),
+    "perf-check": ("perf_check", "Compare the latest recorded run against a rolling baseline."),
+}
+
+
+def load_command(name: str):
+    module_name, _ = COMMANDS[name]
+    return importlib.import_module(f"{__package__}.commands.{module_name}")
+
+
+def build_parser(argv: List[str]) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="enrichment")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+    selected = next((arg for arg in argv if not arg.startswith("-")), None)
+    for name, (_, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        if name == selected:
+            load_command(name).add_arguments(subparser)
+        subparser.add_argument(
+            "--profile",
+            nargs="?",
+            const="",
+            metavar="DIR",
+            help="profile CPU, wall time and memory per stage under DIR (default: YH_PROFILE_DIR)",
+        )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    args = build_parser(argv).parse_args(argv)
+    command = load_command(args.command)
+    if args.profile is None:
+        return command.main(args)
+
+    from .profiling import profile_dir, profile_stage, profiling
+
+    with profiling(profile_dir(args.command, args.profile)):
+        with profile_stage(args.command):
+            return command.main(args)
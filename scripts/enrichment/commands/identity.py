@@ -0,0 +1,1169 @@
+"""``identity``: resolve candidate CUSIPs to tickers, then refresh their sectors."""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from collections import Counter
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from ..candidates import (
+    count_universe_cusips,
+    describe_universe,
+    fetch_fresh_sector_tickers,
+    iter_universe_cusips,
+    sector_reverify_sql,
+)
+from ..db import run_psql, run_psql_script, run_psql_transaction, sql_literal
+from ..gics import VALID_EXCHANGES, normalize_sector, normalize_ticker_for_db
+from ..hedging import hedged_call
+from ..limiter import (
+    AdaptiveController,
+    Limiter,
+    Metrics,
+    TokenBucketLimiter,
+    host_limiter,
+    maybe_adjust_from_metrics,
+    p95,
+    shared_or_local_limiter,
+    sleep_with_stage_delay,
+)
+from ..models import Candidate, IdentityResult, SectorResult
+from ..plans import default_plan_path, read_plans, write_plan
+from ..profiling import flush_profile, profile_stage
+from ..provider import (
+    ProviderRateLimitError,
+    ProviderTimeoutError,
+    fetch_sector_name,
+    search_quotes,
+    session_stats,
+)
+from ..reference import ReferenceIndex, load_reference_index, resolve_from_reference
+from ..run_metrics import record_run
+from ..shards import format_shard, parse_shard, run_and_merge
+from ..shutdown import GracefulShutdown
+from ..settings import (
+    APPLY_MODE,
+    BATCH_SIZE,
+    CANDIDATE_CHUNK_SIZE,
+    GLOBAL_BURST,
+    GLOBAL_RPS,
+    IDENTITY_SOURCE_VERSION,
+    PROFILE_DIR,
+    REFERENCE_DIR,
+    REFERENCE_SOURCE_VERSION,
+    SEARCH_RETRY_MAX,
+    SEARCH_WORKERS,
+    SEARCH_WORKERS_MAX,
+    SECTOR_FETCH_MODE,
+    SECTOR_RETRY_MAX,
+    SECTOR_SOURCE_VERSION,
+    SECTOR_WORKERS,
+    SECTOR_WORKERS_MAX,
+    SHARED_COOLDOWN_SECONDS,
+    SYMBOL_LIMIT,
+)
+
+
+MAX_FAILURE_PREVIEW = 30
+
+T = TypeVar("T")
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--dry-run", action="store_true", help="resolve without writing")
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="run N local shard processes sharing one YH_GLOBAL_RPS budget",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        help="process only hash partition INDEX/COUNT (e.g. one shard per host)",
+    )
+    parser.add_argument(
+        "--rate-state",
+        help="token bucket file shared with sibling shards (set by --shards)",
+    )
+    parser.add_argument("--summary-out", help="also write the structured summary here")
+    parser.add_argument(
+        "--plan-out",
+        help="with --dry-run, write the plan here (default: YH_PLAN_DIR/identity-<utc>.json.gz)",
+    )
+    parser.add_argument(
+        "--apply-plan",
+        nargs="+",
+        metavar="PLAN",
+        help="apply the DB writes from dry-run plan file(s) without provider calls",
+    )
+
+
+def classify_identity_changes(rows: List[Tuple[str, str]]) -> Tuple[Set[str], int]:
+    """Diff resolved (cusip, ticker) pairs against active identities in SQL.
+
+    Returns the CUSIPs whose active ticker is missing or different, plus the
+    unchanged count, without pulling security_identity_map into Python.
+    """
+    if not rows:
+        return set(), 0
+
+    inserts = []
+    for start in range(0, len(rows), BATCH_SIZE):
+        chunk = rows[start : start + BATCH_SIZE]
+        values_sql = ",\n  ".join(
+            f"({sql_literal(cusip)}, {sql_literal(ticker)})" for cusip, ticker in chunk
+        )
+        inserts.append(
+            f"insert into incoming_identity (cusip, ticker) values\n  {values_sql}\n"
+            "on conflict (cusip) do nothing;"
+        )
+
+    sql = f"""
+create temp table incoming_identity (cusip text primary key, ticker text not null);
+{chr(10).join(inserts)}
+select 'changed', i.cusip
+from incoming_identity i
+left join public.security_identity_map sim
+  on sim.cusip = i.cusip
+ and sim.is_active = true
+where sim.ticker is distinct from i.ticker
+union all
+select 'unchanged', count(*)::text
+from incoming_identity i
+join public.security_identity_map sim
+  on sim.cusip = i.cusip
+ and sim.is_active = true
+ and sim.ticker = i.ticker;
+"""
+    changed: Set[str] = set()
+    unchanged = 0
+    for line in run_psql_script(sql).splitlines():
+        kind, value = (line.split("\t") + [""])[:2]
+        if kind == "changed" and value:
+            changed.add(value)
+        elif kind == "unchanged":
+            unchanged = int(value or "0")
+    return changed, unchanged
+
+
+def run_identity_lookup(
+    candidate: Candidate,
+    limiter: Limiter,
+    metrics: Metrics,
+    controller: AdaptiveController,
+) -> IdentityResult:
+    queries = [candidate.cusip]
+    if candidate.issuer_name:
+        queries.append(candidate.issuer_name)
+
+    for query in queries:
+        for attempt in range(1, SEARCH_RETRY_MAX + 1):
+            controller.maybe_pause_for_cooldown()
+            if controller.stop_requested:
+                return IdentityResult(
+                    candidate.cusip,
+                    candidate.issuer_name,
+                    None,
+                    None,
+                    f"stopped_due_to_{controller.stop_reason}",
+                )
+
+            limiter.acquire()
+            sleep_with_stage_delay("identity", controller)
+            started = time.time()
+
+            try:
+                quotes = hedged_call(
+                    lambda: search_quotes(query, max_results=10), limiter, metrics
+                )
+                latency_ms = (time.time() - started) * 1000.0
+                metrics.record_request(latency_ms, "ok")
+                maybe_adjust_from_metrics(metrics, controller)
+
+                fallback_provider_symbol: Optional[str] = None
+                fallback_db_symbol: Optional[str] = None
+                fallback_sector: Optional[Tuple[str, str]] = None
+
+                for quote in quotes:
+                    provider_symbol = str(quote.get("symbol") or "").strip().upper()
+                    quote_type = str(quote.get("quoteType") or "").upper()
+                    exchange = str(quote.get("exchange") or "").upper()
+                    if quote_type != "EQUITY" or not provider_symbol:
+                        continue
+                    if exchange and exchange not in VALID_EXCHANGES:
+                        continue
+
+                    db_symbol = normalize_ticker_for_db(provider_symbol)
+                    if not db_symbol:
+                        continue
+
+                    if fallback_provider_symbol is None:
+                        fallback_provider_symbol = provider_symbol
+                        fallback_db_symbol = db_symbol
+                        # Search quotes often carry the profile sector already.
+                        fallback_sector = normalize_sector(
+                            quote.get("sector") or quote.get("sectorDisp")
+                        )
+
+                if fallback_provider_symbol and fallback_db_symbol:
+                    return IdentityResult(
+                        candidate.cusip,
+                        candidate.issuer_name,
+                        fallback_provider_symbol,
+                        fallback_db_symbol,
+                        "resolved",
+                        fallback_sector[0] if fallback_sector else None,
+                        fallback_sector[1] if fallback_sector else None,
+                    )
+                break
+
+            except ProviderRateLimitError:
+                latency_ms = (time.time() - started) * 1000.0
+                metrics.record_request(latency_ms, "429")
+                limiter.report_throttle(SHARED_COOLDOWN_SECONDS)
+                maybe_adjust_from_metrics(metrics, controller)
+                if attempt >= SEARCH_RETRY_MAX:
+                    break
+                time.sleep(min(8.0, 0.7 * (2 ** (attempt - 1))))
+            except ProviderTimeoutError:
+                metrics.record_request((time.time() - started) * 1000.0, "timeout")
+                maybe_adjust_from_metrics(metrics, controller)
+                if attempt >= SEARCH_RETRY_MAX:
+                    break
+            except Exception as error:  # noqa: BLE001
+                latency_ms = (time.time() - started) * 1000.0
+                status = (
+                    "5xx"
+                    if any(code in str(error) for code in ["500", "502", "503", "504"])
+                    else "error"
+                )
+                metrics.record_request(latency_ms, status)
+                maybe_adjust_from_metrics(metrics, controller)
+                if attempt >= SEARCH_RETRY_MAX:
+                    break
+                time.sleep(min(5.0, 0.5 * attempt))
+
+    return IdentityResult(
+        candidate.cusip, candidate.issuer_name, None, None, "unresolved"
+    )
+
+
+def run_sector_lookup(
+    provider_symbol: str,
+    db_symbol: str,
+    limiter: Limiter,
+    metrics: Metrics,
+    controller: AdaptiveController,
+) -> SectorResult:
+    for attempt in range(1, SECTOR_RETRY_MAX + 1):
+        controller.maybe_pause_for_cooldown()
+        if controller.stop_requested:
+            return SectorResult(
+                provider_symbol, db_symbol, None, None, f"stopped_due_to_{controller.stop_reason}"
+            )
+
+        limiter.acquire()
+        sleep_with_stage_delay("sector", controller)
+        started = time.time()
+
+        try:
+            raw_sector = fetch_sector_name(provider_symbol, SECTOR_FETCH_MODE)
+            latency_ms = (time.time() - started) * 1000.0
+            metrics.record_request(latency_ms, "ok")
+            maybe_adjust_from_metrics(metrics, controller)
+
+            mapped = normalize_sector(raw_sector)
+            if not mapped:
+                return SectorResult(
+                    provider_symbol, db_symbol, None, None, "sector_unmapped"
+                )
+            return SectorResult(
+                provider_symbol, db_symbol, mapped[0], mapped[1], "resolved"
+            )
+
+        except ProviderRateLimitError:
+            latency_ms = (time.time() - started) * 1000.0
+            metrics.record_request(latency_ms, "429")
+            limiter.report_throttle(SHARED_COOLDOWN_SECONDS)
+            maybe_adjust_from_metrics(metrics, controller)
+            if attempt >= SECTOR_RETRY_MAX:
+                return SectorResult(
+                    provider_symbol, db_symbol, None, None, "rate_limited"
+                )
+            time.sleep(min(8.0, 0.7 * (2 ** (attempt - 1))))
+        except ProviderTimeoutError:
+            metrics.record_request((time.time() - started) * 1000.0, "timeout")
+            maybe_adjust_from_metrics(metrics, controller)
+            if attempt >= SECTOR_RETRY_MAX:
+                return SectorResult(provider_symbol, db_symbol, None, None, "timeout")
+        except Exception as error:  # noqa: BLE001
+            latency_ms = (time.time() - started) * 1000.0
+            status = (
+                "5xx"
+                if any(code in str(error) for code in ["500", "502", "503", "504"])
+                else "error"
+            )
+            metrics.record_request(latency_ms, status)
+            maybe_adjust_from_metrics(metrics, controller)
+            if attempt >= SECTOR_RETRY_MAX:
+                return SectorResult(
+                    provider_symbol, db_symbol, None, None, f"fetch_failed:{error}"
+                )
+            time.sleep(min(5.0, 0.5 * attempt))
+
+    return SectorResult(provider_symbol, db_symbol, None, None, "unresolved")
+
+
+def run_write_batches(
+    label: str,
+    rows: List[T],
+    build_sql: Callable[[List[T]], str],
+    metrics: Metrics,
+) -> List[str]:
+    """Write ``rows`` in BATCH_SIZE statements and return their output lines.
+
+    Under ``YH_APPLY_MODE=transaction`` every batch runs in a single
+    transaction with per-batch savepoints; a failing batch is retried row by
+    row in the same transaction and only the failing rows are dropped (logged
+    and counted in ``db_rows_failed``). Otherwise each batch is its own
+    autocommit call.
+    """
+    batches = [rows[start : start + BATCH_SIZE] for start in range(0, len(rows), BATCH_SIZE)]
+    if not batches:
+        return []
+
+    lines: List[str] = []
+    write_started = time.time()
+    if APPLY_MODE == "transaction":
+        outputs, failures = run_psql_transaction(batches, build_sql)
+        for output in outputs:
+            lines.extend(output)
+        for batch_index, row_index, message in failures:
+            print(f"[apply] {label} row dropped {batches[batch_index][row_index]}: {message}")
+        metrics.record_db_rows_failed(len(failures))
+        metrics.record_db_write_ms((time.time() - write_started) * 1000.0)
+        return lines
+
+    for batch in batches:
+        lines.append(run_psql(build_sql(batch)))
+        metrics.record_db_write_ms((time.time() - write_started) * 1000.0)
+        write_started = time.time()
+    return lines
+
+
+def identity_batch_sql(rows: List[Tuple[str, str]], source: str, source_version: str) -> str:
+    values_sql = ",\n      ".join(
+        f"({sql_literal(cusip)}, {sql_literal(ticker)})" for cusip, ticker in rows
+    )
+    return f"""
+with incoming(cusip, ticker) as (
+  values
+      {values_sql}
+), deactivated as (
+  update public.security_identity_map sim
+  set
+    is_active = false,
+    effective_to = timezone('utc', now()),
+    updated_at = timezone('utc', now())
+  where sim.is_active = true
+    and exists (
+      select 1
+      from incoming i
+      where i.cusip = sim.cusip
+        and i.ticker <> sim.ticker
+    )
+  returning sim.id
+), inserted as (
+  insert into public.security_identity_map (
+    cusip,
+    ticker,
+    source,
+    source_version,
+    confidence,
+    effective_from,
+    is_active
+  )
+  select
+    i.cusip,
+    i.ticker,
+    {sql_literal(source)},
+    {sql_literal(source_version)},
+    0.90,
+    timezone('utc', now()),
+    true
+  from incoming i
+  where not exists (
+    select 1
+    from public.security_identity_map sim
+    where sim.is_active = true
+      and sim.cusip = i.cusip
+      and sim.ticker = i.ticker
+  )
+  returning id
+)
+select (select count(*) from deactivated), (select count(*) from inserted);
+"""
+
+
+def apply_identity_batches(
+    changes: List[Tuple[str, str]],
+    metrics: Metrics,
+    source: str = "yahoo-search-cusip",
+    source_version: str = IDENTITY_SOURCE_VERSION,
+) -> Tuple[int, int]:
+    total_deactivated = 0
+    total_inserted = 0
+
+    for line in run_write_batches(
+        "identity",
+        changes,
+        lambda rows: identity_batch_sql(rows, source, source_version),
+        metrics,
+    ):
+        deactivated, inserted = (line.split("\t") + ["0", "0"])[:2]
+        total_deactivated += int(deactivated or "0")
+        total_inserted += int(inserted or "0")
+
+    return total_deactivated, total_inserted
+
+
+def mark_identities_verified(
+    rows: List[Tuple[str, str]], metrics: Optional[Metrics] = None
+) -> int:
+    """Stamp ``last_verified_at`` on active (cusip, ticker) rows a lookup confirmed.
+
+    Only the verification time moves; ``updated_at`` keeps meaning "mapping changed".
+    """
+    total = 0
+    for start in range(0, len(rows), BATCH_SIZE):
+        chunk = rows[start : start + BATCH_SIZE]
+        values_sql = ",\n      ".join(
+            f"({sql_literal(cusip)}, {sql_literal(ticker)})" for cusip, ticker in chunk
+        )
+        sql = f"""
+with verified as (
+  update public.security_identity_map sim
+  set last_verified_at = timezone('utc', now())
+  from (values
+      {values_sql}
+  ) as v(cusip, ticker)
+  where sim.is_active = true
+    and sim.cusip = v.cusip
+    and sim.ticker = v.ticker
+  returning sim.id
+)
+select count(*) from verified;
+"""
+        write_started = time.time()
+        out = run_psql(sql)
+        if metrics is not None:
+            metrics.record_db_write_ms((time.time() - write_started) * 1000.0)
+        total += int(out or "0")
+    return total
+
+
+def mark_lookups_attempted(cusips: List[str], metrics: Optional[Metrics] = None) -> None:
+    """Stamp ``enrichment_lookup_attempts`` for CUSIPs a lookup confirmed nothing for.
+
+    Candidate ordering uses the stamp, so unresolvable CUSIPs move behind
+    identities that are due a re-check rather than leading every run.
+    """
+    for start in range(0, len(cusips), BATCH_SIZE):
+        values_sql = ",\n      ".join(
+            f"({sql_literal(cusip)})" for cusip in cusips[start : start + BATCH_SIZE]
+        )
+        sql = f"""
+insert into public.enrichment_lookup_attempts (cusip)
+values
+      {values_sql}
+on conflict (cusip) do update
+set
+  attempts = public.enrichment_lookup_attempts.attempts + 1,
+  last_attempt_at = timezone('utc', now());
+"""
+        write_started = time.time()
+        run_psql(sql)
+        if metrics is not None:
+            metrics.record_db_write_ms((time.time() - write_started) * 1000.0)
+
+
+def sector_batch_sql(rows: List[Tuple[str, str, str, str]]) -> str:
+    values_sql = ",\n      ".join(
+        f"({sql_literal(ticker)}, {sql_literal(cusip)}, {sql_literal(code)}, {sql_literal(label)})"
+        for ticker, cusip, code, label in rows
+    )
+    return f"""
+with incoming(ticker, cusip, sector_code, sector_label) as (
+  values
+      {values_sql}
+), updated as (
+  update public.security_sector_map s
+  set
+    cusip = coalesce(i.cusip, s.cusip),
+    sector_code = i.sector_code,
+    sector_label = i.sector_label,
+    source = 'yfinance',
+    source_version = {sql_literal(SECTOR_SOURCE_VERSION)},
+    confidence = 0.90,
+    updated_at = timezone('utc', now()),
+    last_verified_at = timezone('utc', now())
+  from incoming i
+  where s.is_active = true
+    and s.ticker = i.ticker
+    and (coalesce(i.cusip, s.cusip), i.sector_code, i.sector_label)
+      is distinct from (s.cusip, s.sector_code, s.sector_label)
+  returning s.id
+), unchanged as (
+  select s.id, s.last_verified_at
+  from public.security_sector_map s
+  join incoming i
+    on s.ticker = i.ticker
+  where s.is_active = true
+    and (coalesce(i.cusip, s.cusip), i.sector_code, i.sector_label)
+      is not distinct from (s.cusip, s.sector_code, s.sector_label)
+), reverified as (
+  update public.security_sector_map s
+  set last_verified_at = timezone('utc', now())
+  from unchanged u
+  where s.id = u.id
+    and {sector_reverify_sql("u.last_verified_at")}
+  returning s.id
+), inserted as (
+  insert into public.security_sector_map (
+    ticker,
+    cusip,
+    sector_code,
+    sector_label,
+    source,
+    source_version,
+    confidence,
+    is_active
+  )
+  select
+    i.ticker,
+    i.cusip,
+    i.sector_code,
+    i.sector_label,
+    'yfinance',
+    {sql_literal(SECTOR_SOURCE_VERSION)},
+    0.90,
+    true
+  from incoming i
+  where not exists (
+    select 1
+    from public.security_sector_map s
+    where s.is_active = true
+      and s.ticker = i.ticker
+  )
+  returning id
+)
+select
+  (select count(*) from updated),
+  (select count(*) from inserted),
+  (select count(*) from unchanged);
+"""
+
+
+def apply_sector_batches(
+    rows: List[Tuple[str, str, str, str]], metrics: Metrics
+) -> Tuple[int, int, int]:
+    """Upsert sector rows, returning (updated, inserted, unchanged) counts.
+
+    Active rows whose cusip, sector code and label already match are left
+    alone so reruns do not rewrite tuples; at most their ``last_verified_at``
+    moves, once per ``SECTOR_TTL_DAYS``.
+    """
+    total_updated = 0
+    total_inserted = 0
+    total_unchanged = 0
+
+    for line in run_write_batches("sector", rows, sector_batch_sql, metrics):
+        updated, inserted, unchanged = (line.split("\t") + ["0", "0", "0"])[:3]
+        total_updated += int(updated or "0")
+        total_inserted += int(inserted or "0")
+        total_unchanged += int(unchanged or "0")
+
+    return total_updated, total_inserted, total_unchanged
+
+
+def wait_for_lookups(
+    pending: Dict[Future, object], shutdown: Optional[GracefulShutdown]
+) -> Set[Future]:
+    """Wait for the next finished lookup.
+
+    After a shutdown signal this gives up once the grace period is over and
+    returns an empty set; the caller then abandons whatever is still pending.
+    """
+    if shutdown is None:
+        done, _ = wait(set(pending.keys()), return_when=FIRST_COMPLETED)
+        return done
+    while True:
+        shutdown.poll()
+        done, _ = wait(
+            set(pending.keys()),
+            timeout=min(0.5, shutdown.remaining()),
+            return_when=FIRST_COMPLETED,
+        )
+        if done or (shutdown.requested and shutdown.remaining() <= 0):
+            return done
+
+
+def run_parallel_identity(
+    candidates: Iterable[Candidate],
+    limiter: Limiter,
+    metrics: Metrics,
+    controller: AdaptiveController,
+    total: Optional[int] = None,
+    shutdown: Optional[GracefulShutdown] = None,
+) -> List[IdentityResult]:
+    results: List[IdentityResult] = []
+    if total == 0:
+        return results
+
+    iterator = iter(candidates)
+    pending: Dict[Future[IdentityResult], Candidate] = {}
+    completed = 0
+    total_label = str(total) if total is not None else "?"
+
+    executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS_MAX)
+    try:
+        while True:
+            if shutdown is not None:
+                shutdown.poll()
+            limit, _ = controller.current_limits("identity")
+            while not controller.stop_requested and len(pending) < limit:
+                try:
+                    candidate = next(iterator)
+                except StopIteration:
+                    break
+                future = executor.submit(
+                    run_identity_lookup, candidate, limiter, metrics, controller
+                )
+                pending[future] = candidate
+
+            if not pending:
+                break
+
+            done = wait_for_lookups(pending, shutdown)
+            if shutdown is not None and not done:
+                print(f"[identity] abandoning {len(pending)} in-flight lookups after shutdown grace")
+                shutdown.abandoned += len(pending)
+                break
+            for future in done:
+                pending.pop(future, None)
+                result = future.result()
+                results.append(result)
+                metrics.record_identity_result()
+                completed += 1
+                if completed % 100 == 0 or completed == total:
+                    print(f"[identity] {completed}/{total_label}")
+
+            if controller.stop_requested and not pending:
+                break
+    finally:
+        # Abandoned lookups are not waited for; their results are dropped.
+        executor.shutdown(wait=not pending, cancel_futures=True)
+
+    return results
+
+
+def run_parallel_sector(
+    provider_items: Iterable[Tuple[str, str]],
+    limiter: Limiter,
+    metrics: Metrics,
+    controller: AdaptiveController,
+    total: Optional[int] = None,
+    shutdown: Optional[GracefulShutdown] = None,
+) -> List[SectorResult]:
+    if total == 0:
+        return []
+
+    results: List[SectorResult] = []
+    pending: Dict[Future[SectorResult], Tuple[str, str]] = {}
+    iterator = iter(provider_items)
+    completed = 0
+    total_label = str(total) if total is not None else "?"
+
+    executor = ThreadPoolExecutor(max_workers=SECTOR_WORKERS_MAX)
+    try:
+        while True:
+            if shutdown is not None:
+                shutdown.poll()
+            limit, _ = controller.current_limits("sector")
+            while not controller.stop_requested and len(pending) < limit:
+                try:
+                    provider_symbol, db_symbol = next(iterator)
+                except StopIteration:
+                    break
+                future = executor.submit(
+                    run_sector_lookup,
+                    provider_symbol,
+                    db_symbol,
+                    limiter,
+                    metrics,
+                    controller,
+                )
+                pending[future] = (provider_symbol, db_symbol)
+
+            if not pending:
+                break
+
+            done = wait_for_lookups(pending, shutdown)
+            if shutdown is not None and not done:
+                print(f"[sector] abandoning {len(pending)} in-flight lookups after shutdown grace")
+                shutdown.abandoned += len(pending)
+                break
+            for future in done:
+                pending.pop(future, None)
+                result = future.result()
+                results.append(result)
+                metrics.record_sector_result()
+                completed += 1
+                if completed % 100 == 0 or completed == total:
+                    print(f"[sector] {completed}/{total_label}")
+
+            if controller.stop_requested and not pending:
+                break
+    finally:
+        # Abandoned lookups are not waited for; their results are dropped.
+        executor.shutdown(wait=not pending, cancel_futures=True)
+
+    return results
+
+
+def build_limiter(args: argparse.Namespace) -> Tuple[Limiter, float]:
+    if args.rate_state:
+        # --shards children share this file; if it is unusable each falls back to 1/N.
+        return shared_or_local_limiter(args.rate_state, args.shard[1] if args.shard else 1)
+    if args.shard:
+        # Shards on other hosts cannot share a bucket, so each takes 1/N of it.
+        scale = 1.0 / args.shard[1]
+        return (
+            TokenBucketLimiter(GLOBAL_RPS * scale, max(1, GLOBAL_BURST // args.shard[1])),
+            scale,
+        )
+    return host_limiter(), 1.0
+
+
+def apply_plans(paths: List[str]) -> int:
+    started = time.time()
+    plans = read_plans(paths, "identity")
+    metrics = Metrics()
+
+    identity_by_source: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+    sector_by_ticker: Dict[str, Tuple[str, str, str, str]] = {}
+    verified_rows: List[Tuple[str, str]] = []
+    for plan in plans:
+        verified_rows.extend((cusip, ticker) for cusip, ticker in plan.get("verified", []))
+        for cusip, ticker, source, source_version in plan["identity_changes"]:
+            identity_by_source.setdefault((source, source_version), []).append(
+                (cusip, ticker)
+            )
+        for ticker, cusip, code, label in plan["sector_rows"]:
+            sector_by_ticker[ticker] = (ticker, cusip, code, label)
+
+    deactivated_total = 0
+    inserted_total = 0
+    for (source, source_version), rows in identity_by_source.items():
+        deactivated, inserted = apply_identity_batches(
+            rows, metrics, source=source, source_version=source_version
+        )
+        deactivated_total += deactivated
+        inserted_total += inserted
+    sector_updated, sector_inserted, sector_unchanged = apply_sector_batches(
+        list(sector_by_ticker.values()), metrics
+    )
+    verified = mark_identities_verified(verified_rows, metrics)
+
+    summary = {
+        "apply_summary": {
+            "plans": list(paths),
+            "plan_created_at": [plan["created_at"] for plan in plans],
+            "identity_changes": sum(len(rows) for rows in identity_by_source.values()),
+            "deactivated": deactivated_total,
+            "inserted": inserted_total,
+            "verified": verified,
+            "sector_rows": len(sector_by_ticker),
+            "sector_updated": sector_updated,
+            "sector_inserted": sector_inserted,
+            "sector_unchanged": sector_unchanged,
+            "db_write_time_ms": round(metrics.db_write_time_ms, 2),
+            "db_rows_failed": metrics.db_rows_failed,
+            "elapsed_seconds": round(time.time() - started, 2),
+        }
+    }
+    print("Structured summary:")
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+def chunked(items: Iterable[Candidate], size: int) -> Iterator[List[Candidate]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def enrich_chunk(
+    chunk: List[Candidate],
+    reference_index: Optional[ReferenceIndex],
+    limiter: Limiter,
+    metrics: Metrics,
+    controller: AdaptiveController,
+    shutdown: GracefulShutdown,
+    dry_run: bool,
+    totals: Counter,
+    failures: List[str],
+    plan: Optional[Dict[str, List[List[Optional[str]]]]],
+) -> None:
+    """Resolve, write and sector-enrich one chunk of candidates.
+
+    Only ``totals``, the capped ``failures`` preview and, on dry runs, the
+    ``plan`` rows outlive the chunk, so memory stays flat with universe size.
+    """
+    with profile_stage("identity"):
+        reference_results: List[IdentityResult] = []
+        remaining = resolve_from_reference(chunk, reference_index, reference_results)
+        lookup_results = run_parallel_identity(
+            remaining, limiter, metrics, controller, shutdown=shutdown
+        )
+        totals["reference_resolved"] += len(reference_results)
+        totals["looked_up"] += len(lookup_results)
+
+        identity_changed_rows: List[Tuple[str, str]] = []
+        reference_changed_rows: List[Tuple[str, str]] = []
+        cusip_by_db_symbol: Dict[str, str] = {}
+        provider_to_db: Dict[str, str] = {}
+        harvested_sectors: Dict[str, SectorResult] = {}
+        resolved_results: List[IdentityResult] = []
+        attempted_cusips: List[str] = []
+
+        for result in reference_results + lookup_results:
+            if not result.db_symbol or not result.provider_symbol:
+                totals["identity_unresolved"] += 1
+                # Stopped lookups never reached the provider; only real misses count.
+                if result.reason == "unresolved":
+                    attempted_cusips.append(result.cusip)
+                if len(failures) < MAX_FAILURE_PREVIEW:
+                    failures.append(f"{result.cusip}: {result.reason}")
+                if plan is not None:
+                    plan["unresolved"].append([result.cusip, result.reason])
+                continue
+
+            cusip_by_db_symbol.setdefault(result.db_symbol, result.cusip)
+            if result.sector_code and result.sector_label:
+                harvested_sectors[result.provider_symbol] = SectorResult(
+                    result.provider_symbol,
+                    result.db_symbol,
+                    result.sector_code,
+                    result.sector_label,
+                    "resolved_from_search",
+                )
+            else:
+                provider_to_db[result.provider_symbol] = result.db_symbol
+            resolved_results.append(result)
+
+        changed_cusips, identity_unchanged = classify_identity_changes(
+            [(result.cusip, result.db_symbol) for result in resolved_results]
+        )
+        totals["identity_unchanged"] += identity_unchanged
+        for result in resolved_results:
+            if result.cusip not in changed_cusips:
+                continue
+
+            totals["identity_changed"] += 1
+            if result.reason.startswith("resolved_reference"):
+                reference_changed_rows.append((result.cusip, result.db_symbol))
+            else:
+                identity_changed_rows.append((result.cusip, result.db_symbol))
+
+    verified_rows = [
+        (result.cusip, result.db_symbol)
+        for result in resolved_results
+        if result.cusip not in changed_cusips
+    ]
+    with profile_stage("identity_write"):
+        if not dry_run and verified_rows:
+            totals["identity_verified"] += mark_identities_verified(verified_rows, metrics)
+        if not dry_run and attempted_cusips:
+            mark_lookups_attempted(attempted_cusips, metrics)
+        if not dry_run and identity_changed_rows:
+            deactivated, inserted = apply_identity_batches(identity_changed_rows, metrics)
+            totals["deactivated"] += deactivated
+            totals["inserted"] += inserted
+        if not dry_run and reference_changed_rows:
+            deactivated, inserted = apply_identity_batches(
+                reference_changed_rows,
+                metrics,
+                source="reference-file",
+                source_version=REFERENCE_SOURCE_VERSION,
+            )
+            totals["deactivated"] += deactivated
+            totals["inserted"] += inserted
+
+    with profile_stage("sector"):
+        for provider_symbol in harvested_sectors:
+            provider_to_db.pop(provider_symbol, None)
+        totals["sector_info_calls_avoided"] += len(harvested_sectors)
+
+        fresh_tickers = fetch_fresh_sector_tickers(
+            [(db_symbol, cusip_by_db_symbol[db_symbol]) for db_symbol in set(provider_to_db.values())]
+        )
+        provider_to_db = {
+            provider_symbol: db_symbol
+            for provider_symbol, db_symbol in provider_to_db.items()
+            if db_symbol not in fresh_tickers
+        }
+        totals["sector_fresh_skipped"] += len(fresh_tickers)
+
+        sector_results = list(harvested_sectors.values()) + run_parallel_sector(
+            sorted(provider_to_db.items()),
+            limiter,
+            metrics,
+            controller,
+            total=len(provider_to_db),
+            shutdown=shutdown,
+        )
+
+        deduped: Dict[str, Tuple[str, str, str, str]] = {}
+        for result in sector_results:
+            if not result.sector_code or not result.sector_label:
+                totals["sector_unresolved"] += 1
+                if len(failures) < MAX_FAILURE_PREVIEW:
+                    failures.append(f"{result.db_symbol}: {result.reason}")
+                if plan is not None:
+                    plan["unresolved"].append([result.db_symbol, result.reason])
+                continue
+
+            one_cusip = cusip_by_db_symbol.get(result.db_symbol)
+            if one_cusip:
+                deduped[result.db_symbol] = (
+                    result.db_symbol,
+                    one_cusip,
+                    result.sector_code,
+                    result.sector_label,
+                )
+
+    with profile_stage("sector_write"):
+        if not dry_run and deduped:
+            updated, inserted, unchanged = apply_sector_batches(list(deduped.values()), metrics)
+            totals["sector_updated"] += updated
+            totals["sector_inserted"] += inserted
+            totals["sector_unchanged"] += unchanged
+
+    if plan is not None:
+        plan["identity_changes"].extend(
+            [cusip, ticker, "yahoo-search-cusip", IDENTITY_SOURCE_VERSION]
+            for cusip, ticker in identity_changed_rows
+        )
+        plan["identity_changes"].extend(
+            [cusip, ticker, "reference-file", REFERENCE_SOURCE_VERSION]
+            for cusip, ticker in reference_changed_rows
+        )
+        plan["verified"].extend(list(row) for row in verified_rows)
+        plan["sector_rows"].extend(list(row) for row in deduped.values())
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.apply_plan:
+        return apply_plans(args.apply_plan)
+    if args.shards > 1 and not args.shard:
+        extra_args = ["--dry-run"] if args.dry_run else []
+        if args.profile is not None:
+            extra_args += ["--profile", args.profile or PROFILE_DIR]
+        return run_and_merge("identity", args.shards, extra_args)
+
+    run_started = time.time()
+    with profile_stage("candidates"):
+        candidate_total = count_universe_cusips(args.shard)
+    candidates: Iterable[Candidate] = iter_universe_cusips(args.shard)
+    if SYMBOL_LIMIT > 0:
+        candidate_total = min(candidate_total, SYMBOL_LIMIT)
+        candidates = islice(candidates, SYMBOL_LIMIT)
+
+    limiter, rps_scale = build_limiter(args)
+    metrics = Metrics()
+    controller = AdaptiveController(limiter, rps_scale)
+    # Stop dispatching on SIGINT/SIGTERM; finished lookups are still written.
+    shutdown = GracefulShutdown(lambda _: controller.request_stop("shutdown")).install()
+
+    if args.shard:
+        print(f"shard={format_shard(args.shard)}")
+    print(f"universe: {describe_universe()}, chunk_size={CANDIDATE_CHUNK_SIZE}")
+    print(f"CUSIPs to process: {candidate_total}")
+    print(f"Mode: {'dry-run' if args.dry_run else 'live'}")
+    print(
+        "profiles: "
+        f"search_workers={SEARCH_WORKERS}, sector_workers={SECTOR_WORKERS}, "
+        f"global_rps={GLOBAL_RPS}, global_burst={GLOBAL_BURST}, batch_size={BATCH_SIZE}, "
+        f"sector_fetch_mode={SECTOR_FETCH_MODE}"
+    )
+
+    reference_index = load_reference_index(REFERENCE_DIR)
+    if reference_index is None:
+        print("reference_index: disabled")
+    else:
+        print(
+            "reference_index: "
+            f"cusips={len(reference_index.by_cusip)}, "
+            f"name_cusips={len(reference_index.by_cusip_name)}, "
+            f"names={len(reference_index.by_name)}, "
+            f"cached={reference_index.from_cache}, load_ms={reference_index.load_ms:.1f}"
+        )
+
+    totals: Counter = Counter()
+    failures: List[str] = []
+    plan: Optional[Dict[str, List[List[Optional[str]]]]] = (
+        {"identity_changes": [], "verified": [], "sector_rows": [], "unresolved": []}
+        if args.dry_run
+        else None
+    )
+    processed = 0
+    chunks = 0
+    chunk_iter = chunked(candidates, CANDIDATE_CHUNK_SIZE)
+    while True:
+        shutdown.poll()
+        # Pulling a chunk is where candidate SQL paging and row parsing happen.
+        with profile_stage("candidates"):
+            chunk = next(chunk_iter, None)
+        if chunk is None:
+            break
+        enrich_chunk(
+            chunk,
+            reference_index,
+            limiter,
+            metrics,
+            controller,
+            shutdown,
+            args.dry_run,
+            totals,
+            failures,
+            plan,
+        )
+        chunks += 1
+        processed += len(chunk)
+        print(f"[chunk {chunks}] {processed}/{candidate_total} candidates")
+        if controller.stop_requested:
+            break
+
+    if reference_index is not None:
+        print(
+            f"reference_index: resolved={totals['reference_resolved']}, "
+            f"remaining={totals['looked_up']}"
+        )
+    print("Identity refresh complete.")
+    for key in (
+        "identity_changed",
+        "identity_unchanged",
+        "identity_verified",
+        "identity_unresolved",
+    ):
+        print(f"{key}={totals[key]}")
+    print(f"deactivated={totals['deactivated']}")
+    print(f"inserted={totals['inserted']}")
+    print(f"sector_info_calls_avoided={totals['sector_info_calls_avoided']}")
+    print(f"sector_fresh_skipped={totals['sector_fresh_skipped']}")
+
+    plan_path = None
+    if plan is not None:
+        plan_path = write_plan(
+            args.plan_out or default_plan_path("identity", args.shard),
+            "identity",
+            {"shard": format_shard(args.shard) if args.shard else None, **plan},
+        )
+        print(f"plan_written={plan_path}")
+
+    print("Sector refresh complete.")
+    print(f"sector_updated={totals['sector_updated']}")
+    print(f"sector_inserted={totals['sector_inserted']}")
+    print(f"sector_unchanged={totals['sector_unchanged']}")
+    print(f"sector_unresolved={totals['sector_unresolved']}")
+    print(f"failures_sampled={len(failures)}")
+    if failures:
+        print("Failure preview:")
+        for line in failures:
+            print(line)
+
+    elapsed_seconds = max(0.001, time.time() - run_started)
+    avg_latency_ms = (
+        sum(metrics.request_latencies_ms) / len(metrics.request_latencies_ms)
+        if metrics.request_latencies_ms
+        else 0.0
+    )
+
+    summary = {
+        "run_summary": {
+            "dry_run": args.dry_run,
+            "elapsed_seconds": round(elapsed_seconds, 2),
+            "candidates_total": candidate_total,
+            "requests_total": metrics.requests_total,
+            "requests_429": metrics.requests_429,
+            "requests_5xx": metrics.requests_5xx,
+            "requests_timeout": metrics.requests_timeout,
+            "request_429_ratio_pct": round(
+                (metrics.requests_429 / metrics.requests_total) * 100.0, 2
+            )
+            if metrics.requests_total
+            else 0.0,
+            "latency_avg_ms": round(avg_latency_ms, 2),
+            "latency_p95_ms": round(p95(metrics.request_latencies_ms), 2),
+            "identity_throughput_per_sec": round(
+                metrics.identity_results / elapsed_seconds, 3
+            ),
+            "sector_throughput_per_sec": round(
+                metrics.sector_results / elapsed_seconds, 3
+            ),
+            "db_write_time_ms": round(metrics.db_write_time_ms, 2),
+            "db_rows_failed": metrics.db_rows_failed,
+            "identity_verified": totals["identity_verified"],
+            "reference_resolved": totals["reference_resolved"],
+            "sector_info_calls_avoided": totals["sector_info_calls_avoided"],
+            "sector_fresh_skipped": totals["sector_fresh_skipped"],
+            "sector_unchanged": totals["sector_unchanged"],
+            "universe": describe_universe(),
+            "chunks": chunks,
+            "hedging": metrics.hedge_summary(),
+            "provider_session": session_stats(),
+            "terminated": shutdown.requested,
+            "adaptive": {
+                "search_workers_final": controller.search_workers,
+                "sector_workers_final": controller.sector_workers,
+                "search_delay_ms_final": controller.search_delay_ms,
+                "sector_delay_ms_final": controller.sector_delay_ms,
+                "global_rps_final": round(controller.global_rps, 2),
+                "stop_requested": controller.stop_requested,
+                "stop_reason": controller.stop_reason,
+            },
+        }
+    }
+    if shutdown.requested:
+        summary["run_summary"]["signal"] = shutdown.signal_name
+        summary["run_summary"]["abandoned_lookups"] = shutdown.abandoned
+    if args.shard:
+        summary["run_summary"]["shard"] = format_shard(args.shard)
+        # A lone --shard i/N run is one of N, not an unsharded run.
+        summary["run_summary"]["shards_total"] = args.shard[1]
+    if plan_path:
+        summary["run_summary"]["plan_path"] = plan_path
+    limiter.close()
+    if args.summary_out:
+        with open(args.summary_out, "w", encoding="utf-8") as handle:
+            json.dump(summary, handle)
+    print("Structured summary:")
+    print(json.dumps(summary, indent=2))
+    record_run("identity", summary["run_summary"])
+    shutdown.restore()
+    if shutdown.abandoned:
+        # Abandoned lookup threads may sit in a provider timeout; everything
+        # worth keeping is already written, so skip joining them at exit.
+        flush_profile()
+        sys.stdout.flush()
+        os._exit(shutdown.exit_code)
+    return shutdown.exit_code
@@ -0,0 +1,167 @@
+"""``perf-check``: flag performance regressions in recorded enrichment runs."""
+
+import argparse
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from ..db import run_psql, sql_literal
+
+
+BASELINE_RUNS = max(1, int(os.getenv("YH_PERF_BASELINE_RUNS", "10")))
+MIN_BASELINE_RUNS = max(1, int(os.getenv("YH_PERF_MIN_BASELINE_RUNS", "3")))
+MIN_REQUESTS = max(0, int(os.getenv("YH_PERF_MIN_REQUESTS", "50")))
+MAX_THROUGHPUT_DROP_PCT = float(os.getenv("YH_PERF_MAX_THROUGHPUT_DROP_PCT", "20"))
+MAX_P95_RISE_PCT = float(os.getenv("YH_PERF_MAX_P95_RISE_PCT", "50"))
+MAX_429_RATIO_PCT = float(os.getenv("YH_PERF_MAX_429_RATIO_PCT", "5"))
+# Baseline runs must have between 1/N and N times the checked run's candidates.
+SIZE_RATIO = max(1.0, float(os.getenv("YH_PERF_SIZE_RATIO", "2")))
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--for",
+        dest="checked_command",
+        default="identity",
+        metavar="COMMAND",
+        help="recorded command to check (default: identity)",
+    )
+    parser.add_argument(
+        "--run-id",
+        type=int,
+        help="enrichment_run_metrics id to check (default: the latest run)",
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=BASELINE_RUNS,
+        help="earlier comparable runs whose median forms the baseline",
+    )
+
+
+def fetch_comparison(command: str, run_id: Optional[int], window: int) -> Optional[List[str]]:
+    """Return the checked run's metrics followed by its baseline medians.
+
+    Baseline runs are earlier runs of the same command, dry-run mode and
+    sharding that finished on their own, made at least MIN_REQUESTS provider
+    requests and had within SIZE_RATIO times as many candidates, since small
+    runs are dominated by fixed costs.
+    """
+    target_filter = f"and id = {int(run_id)}" if run_id is not None else ""
+    sql = f"""
+with target as (
+  select *
+  from public.enrichment_run_metrics
+  where command = {sql_literal(command)}
+    {target_filter}
+  order by id desc
+  limit 1
+), baseline as (
+  select m.identity_throughput_per_sec, m.latency_p95_ms
+  from public.enrichment_run_metrics m
+  join target t
+    on m.command = t.command
+   and m.id < t.id
+   and m.dry_run = t.dry_run
+   and m.shard is not distinct from t.shard
+   and m.shard_count = t.shard_count
+   and (
+     t.candidates_total is null
+     or m.candidates_total between t.candidates_total / {SIZE_RATIO!r}
+                               and t.candidates_total * {SIZE_RATIO!r}
+   )
+  where not m.terminated
+    and m.stop_reason is null
+    and m.requests_total >= {MIN_REQUESTS}
+  order by m.id desc
+  limit {max(1, int(window))}
+)
+select
+  t.id,
+  t.recorded_at,
+  t.terminated or t.stop_reason is not null,
+  t.requests_total,
+  coalesce(t.identity_throughput_per_sec, 0),
+  coalesce(t.latency_p95_ms, 0),
+  coalesce(t.request_429_ratio_pct, 0),
+  (select count(*) from baseline),
+  coalesce((select percentile_cont(0.5) within group (order by identity_throughput_per_sec) from baseline), 0),
+  coalesce((select percentile_cont(0.5) within group (order by latency_p95_ms) from baseline), 0)
+from target t;
+"""
+    raw = run_psql(sql)
+    if not raw:
+        return None
+    return (raw.split("\t") + [""] * 10)[:10]
+
+
+def pct_change(current: float, baseline: float) -> float:
+    return (current - baseline) / baseline * 100.0 if baseline else 0.0
+
+
+def main(args: argparse.Namespace) -> int:
+    row = fetch_comparison(args.checked_command, args.run_id, args.window)
+    if row is None:
+        print(f"No recorded {args.checked_command} runs to check.")
+        return 0
+
+    (
+        run_id,
+        recorded_at,
+        stopped_early,
+        requests_total,
+        throughput,
+        p95_ms,
+        ratio_429,
+        baseline_runs,
+        baseline_throughput,
+        baseline_p95_ms,
+    ) = row
+    report: Dict[str, Any] = {
+        "run_id": int(run_id),
+        "recorded_at": recorded_at,
+        "requests_total": int(requests_total),
+        "identity_throughput_per_sec": float(throughput),
+        "latency_p95_ms": float(p95_ms),
+        "request_429_ratio_pct": float(ratio_429),
+        "baseline_runs": int(baseline_runs),
+        "baseline_throughput_per_sec": round(float(baseline_throughput), 3),
+        "baseline_latency_p95_ms": round(float(baseline_p95_ms), 2),
+        "regressions": [],
+    }
+    regressions: List[str] = report["regressions"]
+
+    # The 429 ratio is an absolute limit, so it is checked even without a baseline.
+    if report["request_429_ratio_pct"] > MAX_429_RATIO_PCT:
+        regressions.append(
+            f"429 ratio {report['request_429_ratio_pct']:.2f}% > {MAX_429_RATIO_PCT:g}%"
+        )
+
+    if stopped_early == "t" or report["requests_total"] < MIN_REQUESTS:
+        report["skipped"] = "run stopped early or made too few requests to compare"
+    elif report["baseline_runs"] < MIN_BASELINE_RUNS:
+        report["skipped"] = f"only {report['baseline_runs']} comparable earlier runs"
+    else:
+        throughput_change = pct_change(
+            report["identity_throughput_per_sec"], report["baseline_throughput_per_sec"]
+        )
+        p95_change = pct_change(report["latency_p95_ms"], report["baseline_latency_p95_ms"])
+        report["throughput_change_pct"] = round(throughput_change, 2)
+        report["latency_p95_change_pct"] = round(p95_change, 2)
+        if -throughput_change > MAX_THROUGHPUT_DROP_PCT:
+            regressions.append(
+                f"throughput down {-throughput_change:.1f}% vs baseline "
+                f"(> {MAX_THROUGHPUT_DROP_PCT:g}%)"
+            )
+        if p95_change > MAX_P95_RISE_PCT:
+            regressions.append(
+                f"p95 latency up {p95_change:.1f}% vs baseline (> {MAX_P95_RISE_PCT:g}%)"
+            )
+
+    for line in regressions:
+        print(f"REGRESSION: {line}")
+    if not regressions:
+        print(f"No regression for {args.checked_command} run {report['run_id']}.")
+    print("Structured summary:")
+    print(json.dumps({"perf_check": report}, indent=2))
+    return 1 if regressions else 0
@@ -0,0 +1,283 @@
+"""``sectors``: classify unmapped candidate securities into GICS sectors."""
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from ..candidates import iter_unresolved_securities, sector_reverify_sql
+from ..db import run_psql, sql_literal
+from ..gics import normalize_sector
+from ..limiter import host_limiter
+from ..plans import default_plan_path, read_plans, write_plan
+from ..provider import ProviderRateLimitError, fetch_sector_name, session_stats
+from ..settings import SHARED_COOLDOWN_SECONDS
+
+
+MAX_FAILURE_PREVIEW = 30
+MAX_WORKERS = max(1, int(os.getenv("YF_MAX_WORKERS", "4")))
+REQUEST_DELAY_MS = max(100, int(os.getenv("YF_REQUEST_DELAY_MS", "350")))
+RETRY_MAX = max(1, int(os.getenv("YF_RETRY_MAX", "5")))
+SOURCE_VERSION = os.getenv("SECTOR_SOURCE_VERSION", "yfinance-info-v1")
+SYMBOL_LIMIT = max(0, int(os.getenv("YF_SYMBOL_LIMIT", "0")))
+SECTOR_FETCH_MODE = (os.getenv("YF_SECTOR_FETCH_MODE", "profile") or "profile").strip().lower()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--dry-run", action="store_true", help="classify without writing")
+    parser.add_argument(
+        "--plan-out",
+        help="with --dry-run, write the plan here (default: YH_PLAN_DIR/sectors-<utc>.json.gz)",
+    )
+    parser.add_argument(
+        "--apply-plan",
+        nargs="+",
+        metavar="PLAN",
+        help="apply the sector rows from dry-run plan file(s) without provider calls",
+    )
+
+
+def upsert_security_sector(
+    ticker: Optional[str],
+    cusip: Optional[str],
+    sector_code: str,
+    sector_label: str,
+    confidence: float,
+) -> Tuple[int, int, int]:
+    """Upsert one sector row, returning (updated, inserted, unchanged) counts.
+
+    A matching active row whose values already agree is not rewritten; only
+    its ``last_verified_at`` moves, at most once per ``YH_SECTOR_TTL_DAYS``.
+    """
+    ticker_sql = sql_literal(ticker) if ticker else "null"
+    cusip_sql = sql_literal(cusip) if cusip else "null"
+    match_sql = (
+        f"(({cusip_sql} is not null and s.cusip = {cusip_sql})\n"
+        f"      or ({ticker_sql} is not null and s.ticker = {ticker_sql}))"
+    )
+    changed_sql = (
+        f"(coalesce({ticker_sql}, s.ticker), coalesce({cusip_sql}, s.cusip),\n"
+        f"       {sql_literal(sector_code)}, {sql_literal(sector_label)})\n"
+        "      is distinct from (s.ticker, s.cusip, s.sector_code, s.sector_label)"
+    )
+
+    sql = f"""
+with updated as (
+  update public.security_sector_map s
+  set
+    ticker = coalesce({ticker_sql}, s.ticker),
+    cusip = coalesce({cusip_sql}, s.cusip),
+    sector_code = {sql_literal(sector_code)},
+    sector_label = {sql_literal(sector_label)},
+    source = 'yfinance',
+    source_version = {sql_literal(SOURCE_VERSION)},
+    confidence = {confidence:.2f},
+    updated_at = timezone('utc', now()),
+    last_verified_at = timezone('utc', now())
+  where s.is_active = true
+    and {match_sql}
+    and {changed_sql}
+  returning s.ticker
+), unchanged as (
+  select s.id, s.last_verified_at
+  from public.security_sector_map s
+  where s.is_active = true
+    and {match_sql}
+    and not {changed_sql}
+), reverified as (
+  update public.security_sector_map s
+  set last_verified_at = timezone('utc', now())
+  from unchanged u
+  where s.id = u.id
+    and {sector_reverify_sql("u.last_verified_at")}
+  returning s.id
+), inserted as (
+  insert into public.security_sector_map (
+    ticker,
+    cusip,
+    sector_code,
+    sector_label,
+    source,
+    source_version,
+    confidence,
+    is_active
+  )
+  select
+    {ticker_sql},
+    {cusip_sql},
+    {sql_literal(sector_code)},
+    {sql_literal(sector_label)},
+    'yfinance',
+    {sql_literal(SOURCE_VERSION)},
+    {confidence:.2f},
+    true
+  where not exists (
+    select 1 from public.security_sector_map s
+    where s.is_active = true
+      and {match_sql}
+  )
+  returning ticker
+)
+select (select count(*) from updated), (select count(*) from inserted), (select count(*) from unchanged);
+"""
+
+    out = run_psql(sql)
+    updated_text, inserted_text, unchanged_text = (out.split("\t") + ["0", "0", "0"])[:3]
+    return int(updated_text or "0"), int(inserted_text or "0"), int(unchanged_text or "0")
+
+
+def fetch_sector_from_yfinance(
+    ticker: str,
+) -> Tuple[str, Optional[Tuple[str, str]], Optional[str]]:
+    for attempt in range(1, RETRY_MAX + 1):
+        try:
+            if REQUEST_DELAY_MS > 0:
+                time.sleep((REQUEST_DELAY_MS / 1000.0) + random.uniform(0, 0.05))
+
+            host_limiter().acquire()
+            raw_sector = fetch_sector_name(ticker, SECTOR_FETCH_MODE)
+            mapped = normalize_sector(raw_sector)
+            return ticker, mapped, None
+        except Exception as error:  # noqa: BLE001
+            if isinstance(error, ProviderRateLimitError):
+                host_limiter().report_throttle(SHARED_COOLDOWN_SECONDS)
+            if attempt >= RETRY_MAX:
+                return ticker, None, str(error)
+            backoff = min(2.0, 0.2 * (2 ** (attempt - 1)))
+            time.sleep(backoff)
+    return ticker, None, "unknown yfinance error"
+
+
+def apply_plans(paths: List[str]) -> int:
+    rows: Dict[Tuple[str, Optional[str]], Tuple[str, str]] = {}
+    for plan in read_plans(paths, "sectors"):
+        for ticker, cusip, sector_code, sector_label in plan["sector_rows"]:
+            rows[(ticker, cusip)] = (sector_code, sector_label)
+
+    inserted = 0
+    updated = 0
+    unchanged = 0
+    for (ticker, cusip), (sector_code, sector_label) in rows.items():
+        row_updated, row_inserted, row_unchanged = upsert_security_sector(
+            ticker=ticker,
+            cusip=cusip,
+            sector_code=sector_code,
+            sector_label=sector_label,
+            confidence=0.90,
+        )
+        updated += row_updated
+        inserted += row_inserted
+        unchanged += row_unchanged
+
+    print("GICS plan applied.")
+    print(f"Plan rows: {len(rows)}")
+    print(f"Inserted rows: {inserted}")
+    print(f"Updated rows: {updated}")
+    print(f"Unchanged rows: {unchanged}")
+    return 0
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.apply_plan:
+        return apply_plans(args.apply_plan)
+
+    stats: Dict[str, int] = {"candidates": 0, "mapped_tickers": 0, "mapped_cusips": 0}
+    resolved_candidates: List[Tuple[str, Optional[str]]] = []
+    unresolved_total = 0
+    unresolved_no_ticker = 0
+    for security in iter_unresolved_securities(stats):
+        unresolved_total += 1
+        if not security.ticker:
+            unresolved_no_ticker += 1
+            continue
+        resolved_candidates.append((security.ticker, security.cusip))
+
+    print(f"Candidate securities (latest filing per institution): {stats['candidates']}")
+    print(f"Already mapped tickers: {stats['mapped_tickers']}")
+    print(f"Already mapped CUSIPs: {stats['mapped_cusips']}")
+    print(f"Securities to classify via yfinance: {unresolved_total}")
+    print(f"Mode: {'dry-run' if args.dry_run else 'live'}")
+    print(
+        f"Workers: {MAX_WORKERS}, retries: {RETRY_MAX}, delay_ms: {REQUEST_DELAY_MS}, "
+        f"fetch_mode: {SECTOR_FETCH_MODE}"
+    )
+    if SYMBOL_LIMIT > 0:
+        print(f"Ticker processing limit enabled: {SYMBOL_LIMIT}")
+
+    unique_tickers = sorted({ticker for ticker, _ in resolved_candidates})
+    if SYMBOL_LIMIT > 0:
+        limited_tickers = set(unique_tickers[:SYMBOL_LIMIT])
+        unique_tickers = sorted(limited_tickers)
+        resolved_candidates = [
+            (ticker, cusip)
+            for ticker, cusip in resolved_candidates
+            if ticker in limited_tickers
+        ]
+
+    sector_by_ticker: Dict[str, Optional[Tuple[str, str]]] = {}
+    failures: List[str] = []
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [
+            executor.submit(fetch_sector_from_yfinance, ticker)
+            for ticker in unique_tickers
+        ]
+        for future in as_completed(futures):
+            ticker, sector, error = future.result()
+            sector_by_ticker[ticker] = sector
+            if error:
+                failures.append(f"{ticker}: {error}")
+
+    inserted = 0
+    updated = 0
+    unchanged = 0
+    unresolved_sector = 0
+    planned_rows: List[List[Optional[str]]] = []
+
+    for ticker, cusip in resolved_candidates:
+        mapped = sector_by_ticker.get(ticker)
+        if not mapped:
+            unresolved_sector += 1
+            continue
+
+        if args.dry_run:
+            planned_rows.append([ticker, cusip, mapped[0], mapped[1]])
+            continue
+
+        sector_code, sector_label = mapped
+        row_updated, row_inserted, row_unchanged = upsert_security_sector(
+            ticker=ticker,
+            cusip=cusip,
+            sector_code=sector_code,
+            sector_label=sector_label,
+            confidence=0.90,
+        )
+        updated += row_updated
+        inserted += row_inserted
+        unchanged += row_unchanged
+
+    print("GICS sync complete.")
+    print(f"Resolved tickers for classification: {len(resolved_candidates)}")
+    print(f"Unresolved securities (no ticker): {unresolved_no_ticker}")
+    print(f"Unresolved securities (no mapped sector): {unresolved_sector}")
+    print(f"Inserted rows: {inserted}")
+    print(f"Updated rows: {updated}")
+    print(f"Unchanged rows: {unchanged}")
+    print(f"Request failures: {len(failures)}")
+    stats = session_stats()
+    print(f"Provider calls: {stats['calls']} over {stats['call_threads']} keep-alive threads")
+    if args.dry_run:
+        plan_path = write_plan(
+            args.plan_out or default_plan_path("sectors"),
+            "sectors",
+            {"sector_rows": planned_rows, "failures": failures},
+        )
+        print(f"Plan written: {plan_path}")
+
+    if failures:
+        print("Failure preview:")
+        for line in failures[:MAX_FAILURE_PREVIEW]:
+            print(line)
+    return 0
@@ -0,0 +1,333 @@
+"""``ticker-refresh``: replace dead tickers on active identities via Yahoo search."""
+
+import argparse
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ..candidates import (
+    describe_universe,
+    fetch_replaceable_cusips,
+    iter_target_ticker_candidates,
+    iter_universe_ticker_candidates,
+)
+from ..db import run_psql, sql_literal
+from ..gics import VALID_EXCHANGES
+from ..limiter import host_limiter
+from ..liveness import liveness_memo
+from ..models import TickerCandidate
+from ..plans import default_plan_path, read_plans, write_plan
+from ..provider import (
+    ProviderRateLimitError,
+    has_recent_history,
+    search_quotes,
+    session_stats,
+)
+from ..settings import SHARED_COOLDOWN_SECONDS, SYMBOL_LIMIT
+from .identity import mark_identities_verified, mark_lookups_attempted
+
+
+REQUEST_DELAY_MS = max(100, int(os.getenv("YH_REQUEST_DELAY_MS", "450")))
+RETRY_MAX = max(1, int(os.getenv("YH_RETRY_MAX", "5")))
+SOURCE_VERSION = os.getenv("IDENTITY_SOURCE_VERSION", "yahoo-symbol-refresh-v1")
+TARGET_TICKER = (os.getenv("YH_TARGET_TICKER", "") or "").strip().upper()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--dry-run", action="store_true", help="validate without writing")
+    parser.add_argument(
+        "--plan-out",
+        help="with --dry-run, write the plan here (default: YH_PLAN_DIR/ticker-refresh-<utc>.json.gz)",
+    )
+    parser.add_argument(
+        "--apply-plan",
+        nargs="+",
+        metavar="PLAN",
+        help="apply the replacements from dry-run plan file(s) without provider calls",
+    )
+
+
+def pace_request() -> None:
+    # Per-job jitter first, then a token from the host-wide Yahoo budget.
+    time.sleep((REQUEST_DELAY_MS / 1000.0) + random.uniform(0.05, 0.2))
+    host_limiter().acquire()
+
+
+def check_active_quote(symbol: str) -> Optional[bool]:
+    """Ask the provider; ``None`` means no definite answer after retries."""
+    for attempt in range(1, RETRY_MAX + 1):
+        pace_request()
+        try:
+            return has_recent_history(symbol)
+        except ProviderRateLimitError:
+            host_limiter().report_throttle(SHARED_COOLDOWN_SECONDS)
+            if attempt == RETRY_MAX:
+                return None
+            time.sleep(min(8.0, 0.7 * (2 ** (attempt - 1))))
+        except Exception as error:  # noqa: BLE001
+            message = str(error).lower()
+            if (
+                "quote not found" in message
+                or "delisted" in message
+                or "no data found" in message
+            ):
+                return False
+            if attempt == RETRY_MAX:
+                return None
+            time.sleep(min(5.0, 0.5 * attempt))
+
+    return None
+
+
+def has_active_quote(symbol: str) -> bool:
+    # Replacement searches re-check the same popular symbols across tickers
+    # and runs; the memo answers those without a history call.
+    memo = liveness_memo()
+    alive = memo.get(symbol)
+    if alive is not None:
+        return alive
+    alive = check_active_quote(symbol)
+    if alive is None:
+        return False
+    memo.put(symbol, alive)
+    return alive
+
+
+def resolve_symbol_from_search(query: str) -> Optional[str]:
+    if not query:
+        return None
+
+    for attempt in range(1, RETRY_MAX + 1):
+        try:
+            pace_request()
+            quotes = search_quotes(query, max_results=10)
+            break
+        except ProviderRateLimitError:
+            host_limiter().report_throttle(SHARED_COOLDOWN_SECONDS)
+            if attempt == RETRY_MAX:
+                return None
+            time.sleep(min(8.0, 0.7 * (2 ** (attempt - 1))))
+        except Exception:
+            if attempt == RETRY_MAX:
+                return None
+            time.sleep(min(5.0, 0.5 * attempt))
+    else:
+        return None
+
+    fallback_symbol: Optional[str] = None
+    for quote in quotes:
+        quote_type = str(quote.get("quoteType") or "").upper()
+        symbol = str(quote.get("symbol") or "").upper().strip()
+        exchange = str(quote.get("exchange") or "").upper().strip()
+        if quote_type != "EQUITY" or not symbol:
+            continue
+        if exchange and exchange not in VALID_EXCHANGES:
+            continue
+        if fallback_symbol is None:
+            fallback_symbol = symbol
+        if has_active_quote(symbol):
+            return symbol
+
+    return fallback_symbol
+
+
+def resolve_replacement_symbol(
+    issuer_name: str, old_ticker: str, cusip: Optional[str]
+) -> Optional[str]:
+    for query in [issuer_name, old_ticker, cusip or ""]:
+        resolved = resolve_symbol_from_search(query)
+        if resolved:
+            return resolved
+    return None
+
+
+def replace_active_identity(cusip: str, ticker: str) -> Tuple[int, int]:
+    sql = f"""
+with deactivated as (
+  update public.security_identity_map
+  set
+    is_active = false,
+    effective_to = timezone('utc', now()),
+    updated_at = timezone('utc', now())
+  where cusip = {sql_literal(cusip)}
+    and is_active = true
+  returning id
+), inserted as (
+  insert into public.security_identity_map (
+    cusip,
+    ticker,
+    source,
+    source_version,
+    confidence,
+    effective_from,
+    is_active
+  )
+  values (
+    {sql_literal(cusip)},
+    {sql_literal(ticker)},
+    'yahoo-symbol-refresh',
+    {sql_literal(SOURCE_VERSION)},
+    0.90,
+    timezone('utc', now()),
+    true
+  )
+  returning id
+)
+select (select count(*) from deactivated), (select count(*) from inserted);
+"""
+    out = run_psql(sql)
+    deactivated, inserted = (out.split("\t") + ["0", "0"])[:2]
+    return int(deactivated or "0"), int(inserted or "0")
+
+
+def apply_plans(paths: List[str]) -> int:
+    upgraded = 0
+    deactivated_total = 0
+    inserted_total = 0
+    failures: List[str] = []
+    verified_rows: List[Tuple[str, str]] = []
+    for plan in read_plans(paths, "ticker-refresh"):
+        verified_rows.extend((cusip, ticker) for cusip, ticker in plan.get("verified", []))
+        for ticker, replacement, cusips in plan["replacements"]:
+            # Identities may have moved since the dry run; re-check conflicts.
+            replaceable = fetch_replaceable_cusips(cusips, ticker, replacement)
+            if not replaceable:
+                failures.append(f"{ticker}: skipped due to conflicting active identity")
+                continue
+            for cusip in replaceable:
+                d, i = replace_active_identity(cusip, replacement)
+                deactivated_total += d
+                inserted_total += i
+                upgraded += 1
+            print(f"Updated {ticker} -> {replacement} for {len(replaceable)} CUSIPs")
+
+    verified = mark_identities_verified(verified_rows)
+
+    print("Ticker refresh plan applied.")
+    print(f"upgraded={upgraded}")
+    print(f"verified={verified}")
+    print(f"deactivated={deactivated_total}")
+    print(f"inserted={inserted_total}")
+    print(f"failures={len(failures)}")
+    for line in failures[:30]:
+        print(line)
+    return 0
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.apply_plan:
+        return apply_plans(args.apply_plan)
+
+    by_ticker: Dict[str, List[TickerCandidate]] = {}
+    if TARGET_TICKER:
+        for row in iter_target_ticker_candidates(TARGET_TICKER):
+            by_ticker.setdefault(row.ticker, []).append(row)
+    if not by_ticker:
+        for row in iter_universe_ticker_candidates():
+            by_ticker.setdefault(row.ticker, []).append(row)
+    candidate_rows = sum(len(rows) for rows in by_ticker.values())
+
+    # Candidate rows arrive least-recently-checked first; keep that order so
+    # YH_SYMBOL_LIMIT trims the freshest tickers.
+    tickers = list(by_ticker.keys())
+    if TARGET_TICKER:
+        tickers = [ticker for ticker in tickers if ticker == TARGET_TICKER]
+    if SYMBOL_LIMIT > 0:
+        tickers = tickers[:SYMBOL_LIMIT]
+
+    print(f"Candidate rows ({describe_universe()}): {candidate_rows}")
+    print(f"Unique tickers to validate: {len(tickers)}")
+    print(f"Mode: {'dry-run' if args.dry_run else 'live'}")
+    print(f"request_delay_ms={REQUEST_DELAY_MS}, retry_max={RETRY_MAX}")
+    if TARGET_TICKER:
+        print(f"target_ticker={TARGET_TICKER}")
+
+    unchanged = 0
+    upgraded = 0
+    unresolved = 0
+    deactivated_total = 0
+    inserted_total = 0
+    failures: List[str] = []
+    replacements: List[Tuple[str, str, List[str]]] = []
+
+    verified_rows: List[Tuple[str, str]] = []
+    # CUSIPs of dead tickers left as they were; stamped so they stop leading
+    # every run's YH_SYMBOL_LIMIT window.
+    attempted_cusips: List[str] = []
+    for ticker in tickers:
+        if has_active_quote(ticker):
+            unchanged += 1
+            verified_rows.extend((row.cusip, ticker) for row in by_ticker[ticker])
+            continue
+
+        rows = by_ticker[ticker]
+        issuer_name = rows[0].issuer_name
+
+        replacement = resolve_replacement_symbol(
+            issuer_name, ticker, rows[0].cusip if rows else None
+        )
+        if not replacement:
+            unresolved += 1
+            failures.append(f"{ticker}: no replacement found")
+            attempted_cusips.extend(row.cusip for row in rows)
+            continue
+
+        if replacement == ticker:
+            unresolved += 1
+            failures.append(f"{ticker}: replacement same as old symbol")
+            attempted_cusips.extend(row.cusip for row in rows)
+            continue
+
+        replaceable = set(
+            fetch_replaceable_cusips([r.cusip for r in rows], ticker, replacement)
+        )
+        target_rows = [r for r in rows if r.cusip in replaceable]
+        if not target_rows:
+            unresolved += 1
+            failures.append(f"{ticker}: skipped due to conflicting active identity")
+            continue
+
+        if args.dry_run:
+            upgraded += len(target_rows)
+            replacements.append((ticker, replacement, [row.cusip for row in target_rows]))
+            continue
+
+        for row in target_rows:
+            d, i = replace_active_identity(row.cusip, replacement)
+            deactivated_total += d
+            inserted_total += i
+            upgraded += 1
+
+        print(f"Updated {ticker} -> {replacement} for {len(target_rows)} CUSIPs")
+
+    verified = 0
+    if not args.dry_run:
+        verified = mark_identities_verified(verified_rows)
+        mark_lookups_attempted(attempted_cusips)
+    memo = liveness_memo()
+    memo.save()
+
+    print("Ticker refresh complete.")
+    print(f"unchanged={unchanged}")
+    print(f"verified={verified}")
+    print(f"liveness_memo_hits={memo.hits}, liveness_checks={memo.misses}")
+    stats = session_stats()
+    print(f"provider_calls={stats['calls']}, provider_call_threads={stats['call_threads']}")
+    print(f"upgraded={upgraded}")
+    print(f"unresolved={unresolved}")
+    print(f"deactivated={deactivated_total}")
+    print(f"inserted={inserted_total}")
+    print(f"failures={len(failures)}")
+    if failures:
+        print("Failure preview:")
+        for line in failures[:30]:
+            print(line)
+    if args.dry_run:
+        plan_path = write_plan(
+            args.plan_out or default_plan_path("ticker-refresh"),
+            "ticker-refresh",
+            {"replacements": replacements, "verified": verified_rows, "failures": failures},
+        )
+        print(f"plan_written={plan_path}")
+    return 0
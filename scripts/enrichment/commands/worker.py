@@ -0,0 +1,398 @@
+"""``worker``: drain the ``enrichment_jobs`` queue with long-running workers.
+
+Jobs are written by whatever notices the need (candidate refresh, ingest, or
+``--enqueue-candidates``) and claimed in batches with ``FOR UPDATE SKIP LOCKED``,
+so any number of workers on any number of hosts can run side by side.
+
+With ``--listen`` an idle worker blocks on the ``enrichment_jobs`` NOTIFY that
+every enqueue sends (including the positions ingest trigger) instead of
+sleeping, then waits a short debounce so filings landing together are claimed
+as one micro-batch.
+
+SIGINT/SIGTERM lets the current batch finish (lookups still running after
+YH_SHUTDOWN_GRACE_SECONDS are handed back as retries), records its outcomes,
+and exits 0.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from ..candidates import (
+    fetch_fresh_sector_tickers,
+    fetch_replaceable_cusips,
+    iter_target_ticker_candidates,
+)
+from ..db import NotificationListener
+from ..jobs import (
+    JOB_CHANNEL,
+    JOB_KINDS,
+    claim_jobs,
+    enqueue_candidate_jobs,
+    enqueue_jobs,
+    finish_jobs,
+)
+from ..limiter import AdaptiveController, Metrics, host_limiter
+from ..liveness import liveness_memo
+from ..models import Candidate, IdentityResult, Job
+from ..profiling import flush_profile
+from ..provider import session_stats
+from ..reference import ReferenceIndex, load_reference_index, resolve_from_reference
+from ..settings import REFERENCE_DIR, REFERENCE_SOURCE_VERSION
+from ..shutdown import GracefulShutdown
+from .identity import (
+    apply_identity_batches,
+    classify_identity_changes,
+    mark_identities_verified,
+    mark_lookups_attempted,
+    run_parallel_identity,
+    run_parallel_sector,
+)
+from .sectors import upsert_security_sector
+from .ticker_refresh import (
+    has_active_quote,
+    replace_active_identity,
+    resolve_replacement_symbol,
+)
+
+
+WORKER_BATCH_SIZE = max(1, int(os.getenv("YH_WORKER_BATCH_SIZE", "25")))
+WORKER_IDLE_SECONDS = max(1.0, float(os.getenv("YH_WORKER_IDLE_SECONDS", "30")))
+WORKER_LEASE_SECONDS = max(60, int(os.getenv("YH_WORKER_LEASE_SECONDS", "600")))
+WORKER_RETRY_BASE_SECONDS = max(1, int(os.getenv("YH_WORKER_RETRY_BASE_SECONDS", "60")))
+WORKER_DEBOUNCE_MS = max(0, int(os.getenv("YH_WORKER_DEBOUNCE_MS", "1500")))
+WORKER_LISTEN_POLL_MS = max(50, int(os.getenv("YH_WORKER_LISTEN_POLL_MS", "500")))
+
+
+def parse_kinds(value: str) -> List[str]:
+    kinds = [kind.strip() for kind in value.split(",") if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in JOB_KINDS]
+    if unknown or not kinds:
+        raise argparse.ArgumentTypeError(
+            f"expected a comma-separated subset of {','.join(JOB_KINDS)}"
+        )
+    return kinds
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--kinds",
+        type=parse_kinds,
+        default=list(JOB_KINDS),
+        help="job kinds to claim, in priority order (default: identity,sector,liveness)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=WORKER_BATCH_SIZE,
+        help="jobs claimed per kind per round (YH_WORKER_BATCH_SIZE)",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="exit when no due jobs remain instead of polling"
+    )
+    parser.add_argument(
+        "--listen",
+        action="store_true",
+        help="wake on enrichment_jobs notifications instead of polling when idle",
+    )
+    parser.add_argument(
+        "--enqueue-candidates",
+        action="store_true",
+        help="enqueue jobs for unmapped snapshot candidates before draining",
+    )
+
+
+class WorkerContext:
+    def __init__(self, reference_index: Optional[ReferenceIndex]) -> None:
+        self.limiter = host_limiter()
+        self.metrics = Metrics()
+        self.controller = AdaptiveController(self.limiter)
+        self.reference_index = reference_index
+        self.shutdown = GracefulShutdown(lambda _: self.controller.request_stop("shutdown"))
+
+    def stopping(self) -> bool:
+        """Turn a recorded signal into a controller stop, then report whether to stop."""
+        self.shutdown.poll()
+        return self.controller.stop_requested
+
+    def idle(self, seconds: float) -> None:
+        deadline = time.time() + seconds
+        while not self.stopping() and time.time() < deadline:
+            time.sleep(min(0.5, max(0.0, deadline - time.time())))
+
+
+def outcome(job: Job, status: str, result: Any = None, error: Optional[str] = None) -> Dict[str, Any]:
+    return {"id": job.id, "outcome": status, "result": result, "error": error}
+
+
+def write_sector(
+    ticker: str, cusip: Optional[str], sector_code: str, sector_label: str
+) -> Optional[str]:
+    # Workers racing on one ticker can trip the active-ticker unique index;
+    # only the affected job is retried instead of the whole batch.
+    try:
+        upsert_security_sector(ticker, cusip, sector_code, sector_label, 0.90)
+    except Exception as error:  # noqa: BLE001
+        return f"sector_write_failed:{error}"
+    return None
+
+
+def process_identity_jobs(jobs: List[Job], context: WorkerContext) -> List[Dict[str, Any]]:
+    by_cusip = {job.subject: job for job in jobs}
+    candidates = [
+        Candidate(cusip=job.subject, issuer_name=str(job.payload.get("issuer_name") or ""))
+        for job in jobs
+    ]
+    reference_results: List[IdentityResult] = []
+    remaining = resolve_from_reference(candidates, context.reference_index, reference_results)
+    results = reference_results + run_parallel_identity(
+        remaining,
+        context.limiter,
+        context.metrics,
+        context.controller,
+        shutdown=context.shutdown,
+    )
+
+    resolved = [result for result in results if result.db_symbol and result.provider_symbol]
+    changed_cusips, _ = classify_identity_changes(
+        [(result.cusip, result.db_symbol) for result in resolved]
+    )
+    search_rows = []
+    reference_rows = []
+    for result in resolved:
+        if result.cusip not in changed_cusips:
+            continue
+        if result.reason.startswith("resolved_reference"):
+            reference_rows.append((result.cusip, result.db_symbol))
+        else:
+            search_rows.append((result.cusip, result.db_symbol))
+    mark_identities_verified(
+        [
+            (result.cusip, result.db_symbol)
+            for result in resolved
+            if result.cusip not in changed_cusips
+        ],
+        context.metrics,
+    )
+    mark_lookups_attempted(
+        [result.cusip for result in results if result.reason == "unresolved"],
+        context.metrics,
+    )
+    if search_rows:
+        apply_identity_batches(search_rows, context.metrics)
+    if reference_rows:
+        apply_identity_batches(
+            reference_rows,
+            context.metrics,
+            source="reference-file",
+            source_version=REFERENCE_SOURCE_VERSION,
+        )
+
+    sector_jobs = []
+    outcomes = []
+    for result in results:
+        job = by_cusip[result.cusip]
+        if not result.db_symbol or not result.provider_symbol:
+            outcomes.append(outcome(job, "retry", error=result.reason))
+            continue
+        sector_written = bool(result.sector_code and result.sector_label) and (
+            write_sector(result.db_symbol, result.cusip, result.sector_code, result.sector_label)
+            is None
+        )
+        if not sector_written:
+            # The sector lookup becomes its own job so it is retried independently.
+            sector_jobs.append(
+                {
+                    "subject": result.db_symbol,
+                    "payload": {"provider_symbol": result.provider_symbol, "cusip": result.cusip},
+                }
+            )
+        outcomes.append(
+            outcome(
+                job,
+                "done",
+                {
+                    "ticker": result.db_symbol,
+                    "reason": result.reason,
+                    "changed": result.cusip in changed_cusips,
+                },
+            )
+        )
+    fresh_tickers = fetch_fresh_sector_tickers(
+        [(job["subject"], job["payload"]["cusip"]) for job in sector_jobs]
+    )
+    enqueue_jobs("sector", [job for job in sector_jobs if job["subject"] not in fresh_tickers])
+    return outcomes
+
+
+def process_sector_jobs(jobs: List[Job], context: WorkerContext) -> List[Dict[str, Any]]:
+    by_ticker = {job.subject: job for job in jobs}
+    items = [
+        (str(job.payload.get("provider_symbol") or job.subject), job.subject) for job in jobs
+    ]
+    outcomes = []
+    for result in run_parallel_sector(
+        items,
+        context.limiter,
+        context.metrics,
+        context.controller,
+        shutdown=context.shutdown,
+    ):
+        job = by_ticker[result.db_symbol]
+        if result.sector_code and result.sector_label:
+            error = write_sector(
+                result.db_symbol,
+                job.payload.get("cusip"),
+                result.sector_code,
+                result.sector_label,
+            )
+            if error:
+                outcomes.append(outcome(job, "retry", error=error))
+            else:
+                outcomes.append(outcome(job, "done", {"sector_code": result.sector_code}))
+        elif result.reason == "sector_unmapped":
+            # The provider answered; retrying will not produce a GICS sector.
+            outcomes.append(outcome(job, "failed", error=result.reason))
+        else:
+            outcomes.append(outcome(job, "retry", error=result.reason))
+    return outcomes
+
+
+def process_liveness_jobs(jobs: List[Job], context: WorkerContext) -> List[Dict[str, Any]]:
+    outcomes = []
+    for job in jobs:
+        rows = list(iter_target_ticker_candidates(job.subject))
+        if not rows:
+            outcomes.append(outcome(job, "done", {"skipped": "no active identity"}))
+            continue
+        if has_active_quote(job.subject):
+            mark_identities_verified([(row.cusip, row.ticker) for row in rows], context.metrics)
+            outcomes.append(outcome(job, "done", {"alive": True}))
+            continue
+
+        replacement = resolve_replacement_symbol(rows[0].issuer_name, job.subject, rows[0].cusip)
+        if not replacement or replacement == job.subject:
+            outcomes.append(outcome(job, "retry", error="no replacement found"))
+            continue
+
+        replaceable = fetch_replaceable_cusips([row.cusip for row in rows], job.subject, replacement)
+        if not replaceable:
+            outcomes.append(
+                outcome(job, "failed", error="skipped due to conflicting active identity")
+            )
+            continue
+        for cusip in replaceable:
+            replace_active_identity(cusip, replacement)
+        outcomes.append(
+            outcome(job, "done", {"replacement": replacement, "cusips": len(replaceable)})
+        )
+    liveness_memo().save()
+    return outcomes
+
+
+PROCESSORS: Dict[str, Callable[[List[Job], WorkerContext], List[Dict[str, Any]]]] = {
+    "identity": process_identity_jobs,
+    "sector": process_sector_jobs,
+    "liveness": process_liveness_jobs,
+}
+
+
+def main(args: argparse.Namespace) -> int:
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(
+        f"worker={worker_id} kinds={','.join(args.kinds)} batch_size={args.batch_size} "
+        f"mode={'once' if args.once else 'listen' if args.listen else 'poll'}"
+    )
+
+    if args.enqueue_candidates:
+        print(f"enqueued: {enqueue_candidate_jobs()}")
+
+    context = WorkerContext(load_reference_index(REFERENCE_DIR))
+    context.shutdown.install()
+    totals: Dict[str, Dict[str, int]] = {
+        kind: {"claimed": 0, "done": 0, "retried": 0, "failed": 0} for kind in args.kinds
+    }
+    listener = (
+        NotificationListener(JOB_CHANNEL, WORKER_LISTEN_POLL_MS / 1000.0)
+        if args.listen and not args.once
+        else None
+    )
+    started = time.time()
+
+    while not context.stopping():
+        claimed_any = False
+        for kind in args.kinds:
+            if context.stopping():
+                break
+            jobs = claim_jobs(kind, worker_id, args.batch_size, WORKER_LEASE_SECONDS)
+            if not jobs:
+                continue
+            claimed_any = True
+            try:
+                outcomes = PROCESSORS[kind](jobs, context)
+            except Exception as error:  # noqa: BLE001
+                outcomes = [outcome(job, "retry", error=f"worker_error:{error}") for job in jobs]
+            # Jobs a processor did not report on (e.g. cut short by a stop) go back too.
+            reported = {entry["id"] for entry in outcomes}
+            outcomes.extend(
+                outcome(job, "retry", error="not_processed")
+                for job in jobs
+                if job.id not in reported
+            )
+            recorded = finish_jobs(outcomes, WORKER_RETRY_BASE_SECONDS)
+            totals[kind]["claimed"] += len(jobs)
+            for key in ("done", "retried", "failed"):
+                totals[kind][key] += int(recorded.get(key, 0))
+            print(f"[{kind}] claimed={len(jobs)} {recorded}")
+
+        if not claimed_any:
+            if args.once:
+                break
+            if listener is None:
+                context.idle(WORKER_IDLE_SECONDS)
+                continue
+            # The idle timeout still fires so retries whose backoff expired are picked up.
+            if listener.wait(WORKER_IDLE_SECONDS, context.stopping):
+                context.idle(WORKER_DEBOUNCE_MS / 1000.0)
+                notified = 1 + len(listener.drain())
+                print(f"[listen] woke on {notified} notification(s)")
+
+    if listener is not None:
+        listener.close()
+    context.limiter.close()
+    summary = {
+        "worker_summary": {
+            "worker": worker_id,
+            "elapsed_seconds": round(time.time() - started, 2),
+            "requests_total": context.metrics.requests_total,
+            "requests_429": context.metrics.requests_429,
+            "requests_timeout": context.metrics.requests_timeout,
+            "hedging": context.metrics.hedge_summary(),
+            "provider_session": session_stats(),
+            "db_write_time_ms": round(context.metrics.db_write_time_ms, 2),
+            "db_rows_failed": context.metrics.db_rows_failed,
+            "jobs": totals,
+            "stop_requested": context.controller.stop_requested,
+            "stop_reason": context.controller.stop_reason,
+            "terminated": context.shutdown.requested,
+        }
+    }
+    if context.shutdown.requested:
+        summary["worker_summary"]["signal"] = context.shutdown.signal_name
+        summary["worker_summary"]["abandoned_lookups"] = context.shutdown.abandoned
+    print("Structured summary:")
+    print(json.dumps(summary, indent=2))
+    context.shutdown.restore()
+    # A throttle stop exits non-zero so a supervisor restarts the worker later;
+    # a requested shutdown is a clean exit.
+    exit_code = 1 if context.controller.stop_reason == "throttle" else 0
+    if context.shutdown.abandoned:
+        # Abandoned lookups were handed back as retries; do not join their threads.
+        flush_profile()
+        sys.stdout.flush()
+        os._exit(exit_code)
+    return exit_code
@@ -0,0 +1,298 @@
+"""psql-over-docker adapter shared by the enrichment commands."""
+
+import queue
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from .settings import DB_CONTAINER, DB_NAME, DB_USER, PSQL_FETCH_COUNT
+
+
+T = TypeVar("T")
+
+
+def run(command: Sequence[str], stdin_text: Optional[str] = None) -> str:
+    # psql runs in its own session so a terminal Ctrl-C does not cancel the
+    # writes a graceful shutdown is still flushing.
+    completed = subprocess.run(
+        list(command),
+        input=stdin_text,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+        start_new_session=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(
+            completed.stderr.strip() or f"Command failed: {' '.join(command)}"
+        )
+    return completed.stdout.strip()
+
+
+def psql_command(*args: str) -> List[str]:
+    return [
+        "docker",
+        "exec",
+        "-i",
+        DB_CONTAINER,
+        "psql",
+        "-U",
+        DB_USER,
+        "-d",
+        DB_NAME,
+        "-At",
+        "-F",
+        "\t",
+        *args,
+    ]
+
+
+def run_psql(sql: str) -> str:
+    return run(psql_command("-c", sql))
+
+
+def iter_psql_rows(sql: str, width: int) -> Iterator[List[str]]:
+    """Yield tab-separated psql rows as they arrive instead of buffering stdout.
+
+    psql's FETCH_COUNT pages the result through a server-side cursor, so
+    neither psql nor this process holds the whole result set. Each row is
+    padded/truncated to ``width`` fields. Closing the generator early
+    terminates psql, so callers can stop reading at any point.
+    """
+    command = psql_command("-v", f"FETCH_COUNT={PSQL_FETCH_COUNT}", "-c", sql)
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            text=True,
+            start_new_session=True,
+        )
+        finished = False
+        try:
+            assert process.stdout is not None
+            for line in process.stdout:
+                line = line.rstrip("\n")
+                if line:
+                    yield (line.split("\t") + [""] * width)[:width]
+            finished = True
+        finally:
+            if not finished and process.poll() is None:
+                process.kill()
+            if process.stdout is not None:
+                process.stdout.close()
+            returncode = process.wait()
+        if finished and returncode != 0:
+            stderr_file.seek(0)
+            message = stderr_file.read().decode("utf-8", "replace").strip()
+            raise RuntimeError(message or f"Command failed: {' '.join(command)}")
+
+
+def run_psql_script(sql: str) -> str:
+    # Multi-statement scripts go through stdin so temp tables share one session
+    # and large VALUES lists stay clear of argv size limits.
+    return run(
+        psql_command("-q", "-v", "ON_ERROR_STOP=1", "-f", "-"),
+        stdin_text=sql,
+    )
+
+
+def run_psql_transaction(
+    batches: Sequence[List[T]], build_sql: Callable[[List[T]], str]
+) -> Tuple[List[List[str]], List[Tuple[int, int, str]]]:
+    """Run write batches in a single transaction with per-batch savepoints.
+
+    Every batch is one ``build_sql(batch)`` statement under a savepoint; a
+    batch that fails is rolled back to it. Once all batches have run, the
+    same session retries only the failed batches row by row, one savepoint
+    and one ``build_sql([row])`` each, so only the offending rows are dropped
+    and no per-row SQL is built for batches that succeed. All surviving
+    writes commit together at the end, and none do if psql dies first.
+    Returns each batch's output lines and (batch, row, error) for every
+    dropped row.
+    """
+    first_pass = ["\\set ON_ERROR_STOP off", "begin;"]
+    for batch_index, batch in enumerate(batches):
+        first_pass += [
+            f"\\echo @batch {batch_index}",
+            "savepoint apply_batch;",
+            build_sql(batch).strip(),
+            "\\if :ERROR",
+            "rollback to savepoint apply_batch;",
+            f"\\echo @batch_failed {batch_index}",
+            "\\else",
+            "release savepoint apply_batch;",
+            "\\endif",
+        ]
+    first_pass.append("\\echo @first_pass_done")
+
+    with tempfile.TemporaryFile() as stderr_file:
+        # The second pass depends on the first pass's output, so the session
+        # stays open between them; a reader thread keeps stdout drained.
+        process = subprocess.Popen(
+            psql_command("-q", "-f", "-"),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            text=True,
+            start_new_session=True,
+        )
+        lines: "queue.Queue[Optional[str]]" = queue.Queue()
+
+        def read() -> None:
+            assert process.stdout is not None
+            for line in process.stdout:
+                lines.put(line.rstrip("\n"))
+            lines.put(None)
+
+        threading.Thread(target=read, daemon=True).start()
+        assert process.stdin is not None
+
+        outputs: List[List[str]] = [[] for _ in batches]
+        failed_batches: List[int] = []
+        failures: List[Tuple[int, int, str]] = []
+        current: List[str] = []
+        second_pass_sent = False
+        try:
+            process.stdin.write("\n".join(first_pass) + "\n")
+            process.stdin.flush()
+            while True:
+                line = lines.get()
+                if line is None:
+                    break
+                if line.startswith("@batch "):
+                    current = outputs[int(line.split(" ", 1)[1])]
+                elif line.startswith("@batch_failed "):
+                    failed_batches.append(int(line.split(" ", 1)[1]))
+                elif line == "@first_pass_done" and not second_pass_sent:
+                    second_pass: List[str] = []
+                    for batch_index in failed_batches:
+                        # Surviving rows' output lines stand in for the failed batch's.
+                        second_pass.append(f"\\echo @batch {batch_index}")
+                        for row_index, row in enumerate(batches[batch_index]):
+                            second_pass += [
+                                "savepoint apply_row;",
+                                build_sql([row]).strip(),
+                                "\\if :ERROR",
+                                "rollback to savepoint apply_row;",
+                                f"\\echo @failed {batch_index} {row_index} :LAST_ERROR_MESSAGE",
+                                "\\else",
+                                "release savepoint apply_row;",
+                                "\\endif",
+                            ]
+                    second_pass += [
+                        "commit;",
+                        "\\if :ERROR",
+                        "\\echo @rolled_back :LAST_ERROR_MESSAGE",
+                        "\\endif",
+                    ]
+                    process.stdin.write("\n".join(second_pass) + "\n")
+                    process.stdin.close()
+                    second_pass_sent = True
+                elif line.startswith("@failed "):
+                    _, batch_index, row_index, message = (line.split(" ", 3) + [""])[:4]
+                    failures.append((int(batch_index), int(row_index), message))
+                elif line.startswith("@rolled_back"):
+                    raise RuntimeError(
+                        f"apply transaction rolled back: {line[len('@rolled_back '):]}"
+                    )
+                elif line:
+                    current.append(line)
+        finally:
+            if not process.stdin.closed:
+                process.stdin.close()
+            if process.poll() is None and not second_pass_sent:
+                process.kill()
+            returncode = process.wait()
+        if returncode != 0 or not second_pass_sent:
+            stderr_file.seek(0)
+            message = stderr_file.read().decode("utf-8", "replace").strip()
+            raise RuntimeError(message or "apply transaction psql session failed")
+    return outputs, failures
+
+
+def sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+NOTIFICATION_RE = re.compile(
+    r'^Asynchronous notification "(?P<channel>[^"]*)"'
+    r'(?: with payload "(?P<payload>.*)")? received from server process'
+)
+
+
+class NotificationListener:
+    """Persistent psql session that ``LISTEN``s on one channel.
+
+    psql only reports notifications after running a command, so ``wait``
+    sends an empty keepalive query every ``poll_seconds`` while it waits.
+    """
+
+    def __init__(self, channel: str, poll_seconds: float) -> None:
+        self.poll_seconds = poll_seconds
+        self.payloads: "queue.Queue[str]" = queue.Queue()
+        self.process = subprocess.Popen(
+            psql_command("-q"),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            start_new_session=True,
+        )
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+        self._send(f"listen {channel};")
+
+    def _read(self) -> None:
+        assert self.process.stdout is not None
+        for line in self.process.stdout:
+            match = NOTIFICATION_RE.match(line.strip())
+            if match:
+                self.payloads.put(match.group("payload") or "")
+
+    def _send(self, sql: str) -> None:
+        if self.process.poll() is not None:
+            raise RuntimeError("notification listener psql session exited")
+        assert self.process.stdin is not None
+        self.process.stdin.write(sql + "\n")
+        self.process.stdin.flush()
+
+    def wait(
+        self, timeout: float, stop: Optional[Callable[[], bool]] = None
+    ) -> List[str]:
+        """Block until a notification arrives, ``timeout`` elapses or ``stop()`` is true."""
+        deadline = time.time() + timeout
+        while True:
+            if stop is not None and stop():
+                return []
+            self._send("select where false;")
+            remaining = deadline - time.time()
+            try:
+                first = self.payloads.get(timeout=max(0.0, min(self.poll_seconds, remaining)))
+            except queue.Empty:
+                if remaining <= self.poll_seconds:
+                    return []
+                continue
+            return [first] + self.drain()
+
+    def drain(self) -> List[str]:
+        payloads: List[str] = []
+        while True:
+            try:
+                payloads.append(self.payloads.get_nowait())
+            except queue.Empty:
+                return payloads
+
+    def close(self) -> None:
+        if self.process.stdin is not None and not self.process.stdin.closed:
+            self.process.stdin.close()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
@@ -0,0 +1,37 @@
+"""Yahoo sector names to GICS, plus ticker/exchange normalisation rules."""
+
+import re
+from typing import Optional, Tuple
+
+
+VALID_EXCHANGES = {"NYQ", "NMS", "ASE", "NYE", "NGM", "NCM", "BTS", "PNK"}
+DB_TICKER_RE = re.compile(r"^[A-Z.]{1,10}$")
+
+GICS_SECTORS = {
+    "communication services": ("50", "Communication Services"),
+    "consumer cyclical": ("25", "Consumer Discretionary"),
+    "consumer defensive": ("30", "Consumer Staples"),
+    "energy": ("10", "Energy"),
+    "financial services": ("40", "Financials"),
+    "healthcare": ("35", "Health Care"),
+    "industrials": ("20", "Industrials"),
+    "technology": ("45", "Information Technology"),
+    "basic materials": ("15", "Materials"),
+    "real estate": ("60", "Real Estate"),
+    "utilities": ("55", "Utilities"),
+}
+
+
+def normalize_sector(raw: Optional[str]) -> Optional[Tuple[str, str]]:
+    if not raw:
+        return None
+    return GICS_SECTORS.get(raw.strip().lower())
+
+
+def normalize_ticker_for_db(value: str) -> Optional[str]:
+    normalized = value.strip().upper().replace("-", ".")
+    if not normalized:
+        return None
+    if not DB_TICKER_RE.fullmatch(normalized):
+        return None
+    return normalized
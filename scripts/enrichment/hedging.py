@@ -0,0 +1,120 @@
+"""Hedged provider calls: race a duplicate against a primary that runs long.
+
+The hedge fires once the primary has been in flight longer than the
+YH_HEDGE_PERCENTILE of recent primary latencies, and only if the limiter has
+a token free right now, so hedges never wait for budget or exceed it. The
+first successful answer wins; the loser keeps running on its daemon thread
+and its result is dropped. A 429 from a copy whose error is never raised is
+still recorded and still sets the shared cooldown, so hedging cannot hide
+throttling from the limiter.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple, TypeVar
+
+from .limiter import Limiter, Metrics
+from .provider import ProviderRateLimitError
+from .settings import HEDGE_MIN_SAMPLES, HEDGE_PERCENTILE, SHARED_COOLDOWN_SECONDS
+
+
+T = TypeVar("T")
+
+
+def hedge_threshold(metrics: Metrics) -> Optional[float]:
+    with metrics.lock:
+        if len(metrics.search_latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(metrics.search_latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100.0))]
+
+
+def report_dropped_error(
+    error: BaseException, started: float, limiter: Limiter, metrics: Metrics
+) -> None:
+    """Account for an error the caller never sees; only 429s matter to pacing."""
+    if isinstance(error, ProviderRateLimitError):
+        metrics.record_request((time.monotonic() - started) * 1000.0, "429")
+        limiter.report_throttle(SHARED_COOLDOWN_SECONDS)
+
+
+def hedged_call(call: Callable[[], T], limiter: Limiter, metrics: Metrics) -> T:
+    """Run ``call``, hedging it with a second copy when it runs past the threshold.
+
+    The primary's own token has already been taken by the caller. Errors are
+    only raised once every launched copy has failed, primary error first.
+    """
+    threshold = hedge_threshold(metrics) if HEDGE_PERCENTILE > 0 else None
+    if threshold is None:
+        started = time.monotonic()
+        result = call()
+        with metrics.lock:
+            metrics.search_latencies.append(time.monotonic() - started)
+        return result
+
+    answers: "queue.Queue[Tuple[str, bool, Any, float]]" = queue.Queue()
+    settled_lock = threading.Lock()
+    settled = False
+
+    def run(role: str) -> None:
+        started = time.monotonic()
+        try:
+            value = call()
+        except Exception as error:  # noqa: BLE001 - handed to the waiting caller
+            with settled_lock:
+                late = settled
+                if not late:
+                    answers.put((role, False, error, started))
+            if late:
+                report_dropped_error(error, started, limiter, metrics)
+            return
+        if role == "primary":
+            with metrics.lock:
+                metrics.search_latencies.append(time.monotonic() - started)
+        answers.put((role, True, value, started))
+
+    with metrics.lock:
+        metrics.hedge_eligible += 1
+    threading.Thread(target=run, args=("primary",), daemon=True).start()
+    launched = 1
+    try:
+        first = answers.get(timeout=threshold)
+    except queue.Empty:
+        if limiter.try_acquire():
+            threading.Thread(target=run, args=("hedge",), daemon=True).start()
+            launched = 2
+        else:
+            metrics.record_hedge(sent=False)
+        first = answers.get()
+
+    errors = []
+    answer = first
+    while True:
+        role, ok, value, started = answer
+        if ok:
+            if launched == 2:
+                metrics.record_hedge(sent=True, won=role == "hedge")
+            # Errors that lost to this answer, queued or still to come, are
+            # accounted for here and in ``run``.
+            with settled_lock:
+                settled = True
+            for _, error, error_started in errors:
+                report_dropped_error(error, error_started, limiter, metrics)
+            while not answers.empty():
+                _, late_ok, late_value, late_started = answers.get_nowait()
+                if not late_ok:
+                    report_dropped_error(late_value, late_started, limiter, metrics)
+            return value
+        errors.append((role, value, started))
+        if len(errors) == launched:
+            break
+        answer = answers.get()
+
+    if launched == 2:
+        metrics.record_hedge(sent=True, won=False)
+    errors.sort(key=lambda item: item[0] != "primary")
+    # The caller records and reports the error it is handed; the other is ours.
+    for _, error, error_started in errors[1:]:
+        report_dropped_error(error, error_started, limiter, metrics)
+    raise errors[0][1]
@@ -0,0 +1,64 @@
+"""Postgres-backed work queue shared by enrichment workers (``enrichment_jobs``)."""
+
+import json
+from typing import Any, Dict, List, Sequence
+
+from .db import iter_psql_rows, run_psql, sql_literal
+from .models import Job
+
+
+JOB_KINDS = ("identity", "sector", "liveness")
+# NOTIFY channel fired by the enrichment_jobs insert trigger.
+JOB_CHANNEL = "enrichment_jobs"
+
+
+def jsonb_literal(value: Any) -> str:
+    return f"{sql_literal(json.dumps(value, separators=(',', ':')))}::jsonb"
+
+
+def enqueue_jobs(kind: str, jobs: Sequence[Dict[str, Any]]) -> int:
+    """Enqueue ``[{"subject": ..., "payload": {...}}]``; open duplicates are skipped."""
+    if not jobs:
+        return 0
+    raw = run_psql(
+        f"select public.enqueue_enrichment_jobs({sql_literal(kind)}, {jsonb_literal(list(jobs))});"
+    )
+    return int(raw or "0")
+
+
+def enqueue_candidate_jobs() -> Dict[str, int]:
+    raw = run_psql("select public.enqueue_enrichment_candidate_jobs()::text;")
+    return json.loads(raw or "{}")
+
+
+def claim_jobs(kind: str, worker: str, limit: int, lease_seconds: int) -> List[Job]:
+    # claim_enrichment_jobs uses FOR UPDATE SKIP LOCKED, so concurrent workers
+    # receive disjoint batches without blocking each other.
+    sql = f"""
+select id, kind, subject, payload::text, attempts
+from public.claim_enrichment_jobs(
+  {sql_literal(kind)}, {sql_literal(worker)}, {int(limit)}, {int(lease_seconds)}
+)
+order by id;
+"""
+    return [
+        Job(
+            id=int(job_id),
+            kind=job_kind,
+            subject=subject,
+            payload=json.loads(payload or "{}"),
+            attempts=int(attempts or "0"),
+        )
+        for job_id, job_kind, subject, payload, attempts in iter_psql_rows(sql, 5)
+    ]
+
+
+def finish_jobs(outcomes: Sequence[Dict[str, Any]], retry_base_seconds: int) -> Dict[str, int]:
+    """Record ``[{"id", "outcome": done|retry|failed, "result", "error"}]``."""
+    if not outcomes:
+        return {"done": 0, "retried": 0, "failed": 0}
+    raw = run_psql(
+        "select public.finish_enrichment_jobs("
+        f"{jsonb_literal(list(outcomes))}, {int(retry_base_seconds)})::text;"
+    )
+    return json.loads(raw or "{}")
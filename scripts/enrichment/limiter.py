@@ -0,0 +1,427 @@
+"""Request pacing shared by the Yahoo-backed enrichment stages."""
+
+import fcntl
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional, Sequence, Tuple, Union
+
+from .settings import (
+    ADAPT_429_THRESHOLD,
+    ADAPT_DELAY_STEP_MS,
+    ADAPT_WINDOW_REQUESTS,
+    COOLDOWN_SECONDS,
+    GLOBAL_BURST,
+    GLOBAL_RPS,
+    GLOBAL_RPS_MIN,
+    HEDGE_SAMPLE_WINDOW,
+    HEALTHY_WINDOWS_TO_SCALE_UP,
+    MAX_CONSECUTIVE_THROTTLED_WINDOWS,
+    RATE_STATE_FILE,
+    SEARCH_DELAY_MAX_MS,
+    SEARCH_DELAY_MIN_MS,
+    SEARCH_DELAY_MS,
+    SEARCH_WORKERS,
+    SEARCH_WORKERS_MAX,
+    SECTOR_DELAY_MAX_MS,
+    SECTOR_DELAY_MIN_MS,
+    SECTOR_DELAY_MS,
+    SECTOR_WORKERS,
+    SECTOR_WORKERS_MAX,
+)
+
+
+class TokenBucketLimiter:
+    def __init__(self, rps: float, burst: int) -> None:
+        self._lock = threading.Lock()
+        self._rps = rps
+        self._burst = float(burst)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+
+    def update_rps(self, rps: float) -> None:
+        with self._lock:
+            self._refill_locked()
+            self._rps = rps
+
+    def _refill_locked(self) -> None:
+        now = time.monotonic()
+        elapsed = max(0.0, now - self._last)
+        self._last = now
+        self._tokens = min(self._burst, self._tokens + elapsed * self._rps)
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                self._refill_locked()
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                needed = 1.0 - self._tokens
+                sleep_seconds = max(0.01, needed / max(self._rps, 0.01))
+            time.sleep(sleep_seconds)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill_locked()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    def report_throttle(self, cooldown_seconds: float) -> None:
+        # Process-local buckets have no one else to warn.
+        return
+
+    def close(self) -> None:
+        return
+
+
+class SharedTokenBucketLimiter:
+    """Token bucket whose state lives in a memory-mapped file.
+
+    Every process opening the same path draws from one budget, so shard
+    processes and overlapping jobs together stay within ``rps``. A 429 seen
+    by any of them sets a shared cooldown that every ``acquire`` waits out.
+    flock serialises processes and the thread lock serialises workers inside
+    one process.
+    """
+
+    # tokens, last refill (epoch seconds), current rps, throttled until, 429 count
+    _STATE = struct.Struct("ddddd")
+    # A bucket untouched for this long belongs to no running job, so its
+    # adapted rate is stale and the opener's configured rate wins.
+    _IDLE_RESET_SECONDS = 60.0
+
+    def __init__(self, path: str, rps: float, burst: int) -> None:
+        self._lock = threading.Lock()
+        self._burst = float(burst)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with self._file_lock():
+                if os.fstat(self._fd).st_size != self._STATE.size:
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, self._STATE.size)
+                self._map = mmap.mmap(self._fd, self._STATE.size)
+                last = self._read()[1]
+                now = time.time()
+                if now - last > self._IDLE_RESET_SECONDS:
+                    self._write(float(burst), now, rps, 0.0, 0.0)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _read(self) -> Tuple[float, float, float, float, float]:
+        return self._STATE.unpack_from(self._map, 0)
+
+    def _write(
+        self, tokens: float, last: float, rps: float, throttled_until: float, events: float
+    ) -> None:
+        self._STATE.pack_into(self._map, 0, tokens, last, rps, throttled_until, events)
+
+    def _refilled(self) -> Tuple[float, float, float, float, float]:
+        tokens, last, rps, throttled_until, events = self._read()
+        now = time.time()
+        tokens = min(self._burst, tokens + max(0.0, now - last) * rps)
+        return tokens, now, rps, throttled_until, events
+
+    def update_rps(self, rps: float) -> None:
+        with self._lock, self._file_lock():
+            tokens, now, _, throttled_until, events = self._refilled()
+            self._write(tokens, now, rps, throttled_until, events)
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock, self._file_lock():
+                tokens, now, rps, throttled_until, events = self._refilled()
+                if throttled_until > now:
+                    sleep_seconds = min(1.0, throttled_until - now)
+                elif tokens >= 1.0:
+                    self._write(tokens - 1.0, now, rps, throttled_until, events)
+                    return
+                else:
+                    sleep_seconds = max(0.01, (1.0 - tokens) / max(rps, 0.01))
+                self._write(tokens, now, rps, throttled_until, events)
+            time.sleep(sleep_seconds)
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is free right now and no cooldown is active."""
+        with self._lock, self._file_lock():
+            tokens, now, rps, throttled_until, events = self._refilled()
+            if throttled_until > now or tokens < 1.0:
+                self._write(tokens, now, rps, throttled_until, events)
+                return False
+            self._write(tokens - 1.0, now, rps, throttled_until, events)
+            return True
+
+    def report_throttle(self, cooldown_seconds: float) -> None:
+        with self._lock, self._file_lock():
+            tokens, now, rps, throttled_until, events = self._refilled()
+            # Drain the bucket too so nobody bursts straight back into Yahoo.
+            self._write(
+                0.0, now, rps, max(throttled_until, now + cooldown_seconds), events + 1
+            )
+
+    def throttle_events(self) -> int:
+        with self._lock, self._file_lock():
+            return int(self._read()[4])
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+Limiter = Union[TokenBucketLimiter, SharedTokenBucketLimiter]
+
+_host_limiter: Optional[Limiter] = None
+_host_limiter_lock = threading.Lock()
+
+
+def shared_or_local_limiter(path: str, share_count: int = 1) -> Tuple[Limiter, float]:
+    """Open the shared bucket at ``path``, or fall back to a process-local one.
+
+    Returns the limiter and the fraction of YH_GLOBAL_RPS it stands for. When
+    the file cannot be opened or mapped (for example it belongs to another
+    user), the local bucket gets 1/``share_count`` of the budget, so sibling
+    shards that all fell back still stay within YH_GLOBAL_RPS together.
+    """
+    try:
+        return SharedTokenBucketLimiter(path, GLOBAL_RPS, GLOBAL_BURST), 1.0
+    except OSError as error:
+        print(
+            f"[limiter] shared rate state unavailable ({error}); "
+            "falling back to a per-process bucket"
+        )
+    scale = 1.0 / share_count
+    return TokenBucketLimiter(GLOBAL_RPS * scale, max(1, GLOBAL_BURST // share_count)), scale
+
+
+def host_limiter() -> Limiter:
+    """Process-wide limiter backed by the host-wide bucket in YH_RATE_STATE_FILE.
+
+    Every enrichment job on the host shares that file, so overlapping cron
+    runs split one YH_GLOBAL_RPS budget and see each other's 429 cooldowns.
+    With YH_RATE_STATE_FILE=off, or when the file cannot be opened (for
+    example it belongs to another user), this degrades to a per-process bucket.
+    """
+    global _host_limiter
+    with _host_limiter_lock:
+        if _host_limiter is None:
+            if RATE_STATE_FILE:
+                _host_limiter, _ = shared_or_local_limiter(RATE_STATE_FILE)
+            else:
+                _host_limiter = TokenBucketLimiter(GLOBAL_RPS, GLOBAL_BURST)
+        return _host_limiter
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.requests_total = 0
+        self.requests_429 = 0
+        self.requests_5xx = 0
+        self.requests_timeout = 0
+        # Packed doubles: full-universe runs record one sample per request.
+        self.request_latencies_ms = array("d")
+        self.identity_results = 0
+        self.sector_results = 0
+        self.db_write_time_ms = 0.0
+        self.db_rows_failed = 0
+        # Hedged searches: primary latencies (seconds) set the hedge threshold.
+        self.search_latencies: Deque[float] = deque(maxlen=HEDGE_SAMPLE_WINDOW)
+        self.hedge_eligible = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self.hedges_skipped_no_token = 0
+        self._window_total = 0
+        self._window_429 = 0
+        self._window_5xx = 0
+
+    def record_request(self, latency_ms: float, status: str) -> None:
+        with self.lock:
+            self.requests_total += 1
+            self._window_total += 1
+            self.request_latencies_ms.append(latency_ms)
+            if status == "429":
+                self.requests_429 += 1
+                self._window_429 += 1
+            if status == "5xx":
+                self.requests_5xx += 1
+                self._window_5xx += 1
+            if status == "timeout":
+                self.requests_timeout += 1
+
+    def record_identity_result(self) -> None:
+        with self.lock:
+            self.identity_results += 1
+
+    def record_sector_result(self) -> None:
+        with self.lock:
+            self.sector_results += 1
+
+    def record_hedge(self, sent: bool, won: bool = False) -> None:
+        with self.lock:
+            if sent:
+                self.hedges_sent += 1
+                self.hedge_wins += int(won)
+            else:
+                self.hedges_skipped_no_token += 1
+
+    def hedge_summary(self) -> Dict[str, float]:
+        with self.lock:
+            return {
+                "eligible_searches": self.hedge_eligible,
+                "hedges_sent": self.hedges_sent,
+                "hedge_wins": self.hedge_wins,
+                "hedge_win_rate_pct": round(self.hedge_wins / self.hedges_sent * 100.0, 2)
+                if self.hedges_sent
+                else 0.0,
+                "extra_load_pct": round(self.hedges_sent / self.hedge_eligible * 100.0, 2)
+                if self.hedge_eligible
+                else 0.0,
+                "skipped_no_token": self.hedges_skipped_no_token,
+            }
+
+    def record_db_write_ms(self, duration_ms: float) -> None:
+        with self.lock:
+            self.db_write_time_ms += duration_ms
+
+    def record_db_rows_failed(self, count: int) -> None:
+        with self.lock:
+            self.db_rows_failed += count
+
+    def pop_window(self) -> Tuple[int, int, int]:
+        with self.lock:
+            total = self._window_total
+            throttled = self._window_429
+            five_xx = self._window_5xx
+            self._window_total = 0
+            self._window_429 = 0
+            self._window_5xx = 0
+            return total, throttled, five_xx
+
+
+class AdaptiveController:
+    def __init__(self, limiter: Limiter, rps_scale: float = 1.0) -> None:
+        self.lock = threading.Lock()
+        self.limiter = limiter
+        # Fraction of YH_GLOBAL_RPS this process may use (1/N for static shards).
+        self.rps_scale = rps_scale
+        self.search_workers = SEARCH_WORKERS
+        self.sector_workers = SECTOR_WORKERS
+        self.search_delay_ms = SEARCH_DELAY_MS
+        self.sector_delay_ms = SECTOR_DELAY_MS
+        self.global_rps = GLOBAL_RPS
+        self.healthy_windows = 0
+        self.consecutive_throttled_windows = 0
+        self.cooldown_until = 0.0
+        self.stop_requested = False
+        self.stop_reason = ""
+
+    def current_limits(self, stage: str) -> Tuple[int, int]:
+        with self.lock:
+            if stage == "identity":
+                return self.search_workers, self.search_delay_ms
+            return self.sector_workers, self.sector_delay_ms
+
+    def request_stop(self, reason: str) -> None:
+        """Stop dispatching new lookups; the first reason given is kept."""
+        with self.lock:
+            if not self.stop_requested:
+                self.stop_requested = True
+                self.stop_reason = reason
+
+    def maybe_pause_for_cooldown(self) -> None:
+        while True:
+            with self.lock:
+                remaining = self.cooldown_until - time.time()
+                stop = self.stop_requested
+            if stop:
+                return
+            if remaining <= 0:
+                return
+            time.sleep(min(1.0, remaining))
+
+    def observe_window(self, total: int, throttled: int) -> None:
+        if total <= 0:
+            return
+
+        ratio = throttled / total
+        with self.lock:
+            if ratio > ADAPT_429_THRESHOLD:
+                self.healthy_windows = 0
+                self.consecutive_throttled_windows += 1
+
+                self.search_workers = max(1, self.search_workers - 1)
+                self.sector_workers = max(1, self.sector_workers - 1)
+                self.search_delay_ms = min(
+                    SEARCH_DELAY_MAX_MS, self.search_delay_ms + ADAPT_DELAY_STEP_MS
+                )
+                self.sector_delay_ms = min(
+                    SECTOR_DELAY_MAX_MS, self.sector_delay_ms + ADAPT_DELAY_STEP_MS
+                )
+                self.global_rps = max(GLOBAL_RPS_MIN, self.global_rps - 0.2)
+                self.limiter.update_rps(self.global_rps * self.rps_scale)
+                self.cooldown_until = max(
+                    self.cooldown_until, time.time() + COOLDOWN_SECONDS
+                )
+
+                if (
+                    self.consecutive_throttled_windows
+                    >= MAX_CONSECUTIVE_THROTTLED_WINDOWS
+                ) and not self.stop_requested:
+                    self.stop_requested = True
+                    self.stop_reason = "throttle"
+            else:
+                self.consecutive_throttled_windows = 0
+                self.healthy_windows += 1
+                if self.healthy_windows >= HEALTHY_WINDOWS_TO_SCALE_UP:
+                    self.search_workers = min(
+                        SEARCH_WORKERS_MAX, self.search_workers + 1
+                    )
+                    self.sector_workers = min(
+                        SECTOR_WORKERS_MAX, self.sector_workers + 1
+                    )
+                    self.search_delay_ms = max(
+                        SEARCH_DELAY_MIN_MS, self.search_delay_ms - ADAPT_DELAY_STEP_MS
+                    )
+                    self.sector_delay_ms = max(
+                        SECTOR_DELAY_MIN_MS, self.sector_delay_ms - ADAPT_DELAY_STEP_MS
+                    )
+                    self.global_rps = min(GLOBAL_RPS, self.global_rps + 0.2)
+                    self.limiter.update_rps(self.global_rps * self.rps_scale)
+                    self.healthy_windows = 0
+
+
+def p95(values: Sequence[float]) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = max(0, int(len(ordered) * 0.95) - 1)
+    return ordered[idx]
+
+
+def maybe_adjust_from_metrics(metrics: Metrics, controller: AdaptiveController) -> None:
+    total, throttled, _ = metrics.pop_window()
+    if total >= ADAPT_WINDOW_REQUESTS:
+        controller.observe_window(total, throttled)
+
+
+def sleep_with_stage_delay(stage: str, controller: AdaptiveController) -> None:
+    _, delay_ms = controller.current_limits(stage)
+    time.sleep((delay_ms / 1000.0) + random.uniform(0.03, 0.12))
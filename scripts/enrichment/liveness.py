@@ -0,0 +1,87 @@
+"""Symbol liveness memo shared within a run and persisted across runs with a TTL."""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .settings import LIVENESS_CACHE_FILE, LIVENESS_TTL_HOURS
+
+
+class LivenessMemo:
+    """Maps provider symbol -> (alive, checked_at epoch seconds).
+
+    Only definite answers are stored; a check that ran out of retries is not
+    remembered. ``save`` merges with whatever other processes wrote meanwhile,
+    keeping the newest entry per symbol.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Tuple[bool, float]] = self._load() if path else {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    def _load(self) -> Dict[str, Tuple[bool, float]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                raw = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        cutoff = time.time() - self.ttl_seconds
+        return {
+            symbol: (bool(alive), float(checked_at))
+            for symbol, (alive, checked_at) in raw.items()
+            if float(checked_at) >= cutoff
+        }
+
+    def get(self, symbol: str) -> Optional[bool]:
+        with self.lock:
+            entry = self.entries.get(symbol)
+            if entry is None or entry[1] < time.time() - self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, symbol: str, alive: bool) -> None:
+        with self.lock:
+            self.entries[symbol] = (alive, time.time())
+            self.dirty = True
+
+    def save(self) -> None:
+        if not self.path or not self.dirty:
+            return
+        with self.lock:
+            merged = self._load()
+            for symbol, entry in self.entries.items():
+                if symbol not in merged or merged[symbol][1] < entry[1]:
+                    merged[symbol] = entry
+            directory = os.path.dirname(self.path)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as handle:
+                    json.dump(merged, handle, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+                self.dirty = False
+            except OSError as error:
+                print(f"[liveness] memo write skipped: {error}")
+
+
+_liveness_memo: Optional[LivenessMemo] = None
+_liveness_memo_lock = threading.Lock()
+
+
+def liveness_memo() -> LivenessMemo:
+    """Process-wide memo backed by YH_LIVENESS_CACHE_FILE ("off" keeps it in memory)."""
+    global _liveness_memo
+    with _liveness_memo_lock:
+        if _liveness_memo is None:
+            _liveness_memo = LivenessMemo(LIVENESS_CACHE_FILE, LIVENESS_TTL_HOURS * 3600.0)
+        return _liveness_memo
@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+from typing import Any, Dict, NamedTuple, Optional
+
+
+# Per-security records are tuples: full-universe runs create them by the
+# ten thousand, and tuples carry no per-instance __dict__.
+class Candidate(NamedTuple):
+    cusip: str
+    issuer_name: str
+
+
+class TickerCandidate(NamedTuple):
+    cusip: str
+    ticker: str
+    issuer_name: str
+
+
+class CandidateSecurity(NamedTuple):
+    ticker: Optional[str]
+    cusip: Optional[str]
+
+
+class IdentityResult(NamedTuple):
+    cusip: str
+    issuer_name: str
+    provider_symbol: Optional[str]
+    db_symbol: Optional[str]
+    reason: str
+    sector_code: Optional[str] = None
+    sector_label: Optional[str] = None
+
+
+class SectorResult(NamedTuple):
+    provider_symbol: str
+    db_symbol: str
+    sector_code: Optional[str]
+    sector_label: Optional[str]
+    reason: str
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    subject: str
+    payload: Dict[str, Any]
+    attempts: int
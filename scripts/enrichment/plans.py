@@ -0,0 +1,55 @@
+"""Dry-run plan files: the DB writes a run would make, applied later without refetching.
+
+A plan is gzip-compressed JSON with a ``command`` tag, so a plan written by
+one command cannot be applied by another. Applying re-checks current state
+in SQL (the writes are idempotent upserts), so a plan that is partly stale
+only skips the rows that no longer differ.
+"""
+
+import gzip
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from .candidates import Shard
+from .settings import PLAN_DIR
+
+
+PLAN_VERSION = 1
+
+
+def default_plan_path(command: str, shard: Optional[Shard] = None) -> str:
+    stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    suffix = f"-shard-{shard[0]}-of-{shard[1]}" if shard else ""
+    return os.path.join(PLAN_DIR, f"{command}-{stamp}{suffix}.json.gz")
+
+
+def write_plan(path: str, command: str, body: Dict[str, Any]) -> str:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    plan = {
+        "version": PLAN_VERSION,
+        "command": command,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **body,
+    }
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as handle:
+        json.dump(plan, handle, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_plans(paths: Sequence[str], command: str) -> List[Dict[str, Any]]:
+    plans = []
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            plan = json.load(handle)
+        if plan.get("version") != PLAN_VERSION:
+            raise ValueError(f"{path}: unsupported plan version {plan.get('version')!r}")
+        if plan.get("command") != command:
+            raise ValueError(f"{path}: plan was written by {plan.get('command')!r}, not {command!r}")
+        plans.append(plan)
+    return plans
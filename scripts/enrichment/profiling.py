@@ -0,0 +1,217 @@
+"""Opt-in per-stage CPU, wall-clock and memory profiling (``--profile``).
+
+Each named stage records wall time, process CPU time (all threads), the
+tracemalloc peak and a cProfile of the thread that entered it. A sampler
+thread also snapshots every thread's stack on a fixed interval and writes
+them as folded stacks rooted at the active stage path, which flamegraph.pl,
+inferno and speedscope load directly. CPU well below wall time means the
+stage is waiting on the provider or the database rather than on Python.
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import FrameType
+from typing import Dict, Iterator, List, Optional
+
+from .settings import PROFILE_DIR, PROFILE_SAMPLE_MS
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_bytes: int = 0
+    samples: int = 0
+    profile: cProfile.Profile = field(default_factory=cProfile.Profile)
+
+
+class _OpenStage:
+    def __init__(self, path: str, stats: StageStats) -> None:
+        self.path = path
+        self.stats = stats
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.peak_bytes = 0
+
+
+class Profiler:
+    def __init__(self, out_dir: str) -> None:
+        self.out_dir = out_dir
+        self.stages: Dict[str, StageStats] = {}
+        self.folded: Counter = Counter()
+        self._open: List[_OpenStage] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        tracemalloc.start()
+        self._sampler.start()
+
+    def _fold_peak(self) -> None:
+        # tracemalloc keeps a single peak, so it is handed to every open stage
+        # before being reset for the next one.
+        _, peak = tracemalloc.get_traced_memory()
+        for open_stage in self._open:
+            open_stage.peak_bytes = max(open_stage.peak_bytes, peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        with self._lock:
+            self._fold_peak()
+            parent = self._open[-1] if self._open else None
+            path = f"{parent.path};{name}" if parent else name
+            stats = self.stages.setdefault(path, StageStats())
+            opened = _OpenStage(path, stats)
+            self._open.append(opened)
+        # Only one cProfile can be active, so each stage's pstats exclude its children.
+        if parent:
+            parent.stats.profile.disable()
+        stats.profile.enable()
+        try:
+            yield
+        finally:
+            stats.profile.disable()
+            if parent:
+                parent.stats.profile.enable()
+            with self._lock:
+                if opened not in self._open:
+                    # Already closed out by finish().
+                    return
+                self._fold_peak()
+                self._open.remove(opened)
+                stats.calls += 1
+                stats.wall_seconds += time.perf_counter() - opened.started
+                stats.cpu_seconds += time.process_time() - opened.cpu_started
+                stats.peak_bytes = max(stats.peak_bytes, opened.peak_bytes)
+
+    def _sample(self) -> None:
+        interval = PROFILE_SAMPLE_MS / 1000.0
+        own_id = threading.get_ident()
+        while not self._stop.wait(interval):
+            with self._lock:
+                path = self._open[-1].path if self._open else "(no stage)"
+                stats = self.stages.get(path)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                current: Optional[FrameType] = frame
+                while current is not None:
+                    code = current.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    )
+                    current = current.f_back
+                self.folded[";".join([path, *reversed(stack)])] += 1
+                if stats is not None:
+                    stats.samples += 1
+
+    def finish(self) -> Dict[str, Dict[str, float]]:
+        """Stop sampling, write the profile files and return the per-stage report.
+
+        Stages still open (a run leaving through ``os._exit``) are counted up
+        to now, as if they had closed here.
+        """
+        self._stop.set()
+        self._sampler.join()
+        with self._lock:
+            self._fold_peak()
+            for opened in reversed(self._open):
+                opened.stats.profile.disable()
+                opened.stats.calls += 1
+                opened.stats.wall_seconds += time.perf_counter() - opened.started
+                opened.stats.cpu_seconds += time.process_time() - opened.cpu_started
+                opened.stats.peak_bytes = max(opened.stats.peak_bytes, opened.peak_bytes)
+            self._open = []
+        tracemalloc.stop()
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        with open(os.path.join(self.out_dir, "stacks.folded"), "w", encoding="utf-8") as handle:
+            for stack, count in sorted(self.folded.items()):
+                handle.write(f"{stack} {count}\n")
+
+        report: Dict[str, Dict[str, float]] = {}
+        for path, stats in self.stages.items():
+            stats.profile.dump_stats(
+                os.path.join(self.out_dir, f"{path.replace(';', '.')}.pstats")
+            )
+            report[path] = {
+                "calls": stats.calls,
+                "wall_seconds": round(stats.wall_seconds, 3),
+                "cpu_seconds": round(stats.cpu_seconds, 3),
+                "cpu_pct_of_wall": round(stats.cpu_seconds / stats.wall_seconds * 100.0, 1)
+                if stats.wall_seconds
+                else 0.0,
+                "peak_memory_mb": round(stats.peak_bytes / (1024 * 1024), 2),
+                "samples": stats.samples,
+            }
+        with open(os.path.join(self.out_dir, "stages.json"), "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+        return report
+
+
+_profiler: Optional[Profiler] = None
+
+
+def profile_dir(command: str, base_dir: Optional[str] = None) -> str:
+    """One directory per run and process, so shard children never collide."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return os.path.join(base_dir or PROFILE_DIR, f"{command}-{stamp}-{os.getpid()}")
+
+
+@contextmanager
+def profiling(out_dir: Optional[str]) -> Iterator[None]:
+    """Profile everything inside the block when ``out_dir`` is set."""
+    global _profiler
+    if not out_dir:
+        yield
+        return
+    _profiler = Profiler(out_dir)
+    _profiler.start()
+    try:
+        yield
+    finally:
+        flush_profile()
+
+
+def flush_profile() -> None:
+    """Write and report the active profile now; a no-op when none is running.
+
+    Commands that leave through ``os._exit`` call this first, since the
+    ``profiling`` block never gets to unwind for them.
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return
+    report = profiler.finish()
+    print("[profile] stage wall_s cpu_s cpu% peak_mb")
+    for path, row in report.items():
+        print(
+            f"[profile] {path} {row['wall_seconds']} {row['cpu_seconds']} "
+            f"{row['cpu_pct_of_wall']} {row['peak_memory_mb']}"
+        )
+    print(f"[profile] written to {profiler.out_dir} (stacks.folded, <stage>.pstats, stages.json)")
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    """Attribute the block to stage ``name``; free when profiling is off."""
+    profiler = _profiler
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
@@ -0,0 +1,261 @@
+"""Yahoo Finance access for the enrichment commands.
+
+yfinance pulls in pandas and numpy, so it is imported on first use. Commands
+served entirely from the database or reference files never load it.
+Provider-specific rate-limit errors surface as ``ProviderRateLimitError``.
+
+All calls share one keep-alive session, built the way the installed
+yfinance builds its own (curl_cffi or requests). yfinance's ``YfData`` is a
+singleton that swaps in whatever session it is handed, so one session per
+process is what keeps its cookie and crumb from being refetched.
+
+Every call runs under a YH_PROVIDER_TIMEOUT_SECONDS deadline. yfinance's own
+``timeout`` only bounds each socket read, so a slow-dripping response or a
+stuck connect can outlive it; past the deadline the caller gets
+``ProviderTimeoutError`` and its worker slot back, while the stuck call is
+left to finish on its daemon thread.
+"""
+
+import queue
+import threading
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .settings import PROVIDER_POOL_CONNECTIONS, PROVIDER_TIMEOUT_SECONDS
+
+
+QUOTE_SUMMARY_URL = "https://query2.finance.yahoo.com/v10/finance/quoteSummary/"
+
+_import_lock = threading.Lock()
+_yf: Optional[ModuleType] = None
+_rate_limit_error: Any = None
+_yf_data: Any = None
+_session: Any = None
+_session_backend = "yfinance-default"
+
+
+T = TypeVar("T")
+
+
+class ProviderRateLimitError(Exception):
+    pass
+
+
+class ProviderTimeoutError(Exception):
+    pass
+
+
+def _load() -> ModuleType:
+    global _yf, _rate_limit_error, _yf_data
+    if _yf is not None:
+        return _yf
+    with _import_lock:
+        if _yf is None:
+            try:
+                import yfinance
+            except ImportError as exc:
+                raise SystemExit(
+                    "Missing dependency: yfinance. Install with: pip install yfinance requests pandas tqdm"
+                ) from exc
+            from yfinance.exceptions import YFRateLimitError
+
+            try:
+                from yfinance.data import YfData
+            except ImportError:  # pragma: no cover - older yfinance releases
+                YfData = None
+            _rate_limit_error = YFRateLimitError
+            _yf_data = YfData
+            _build_session()
+            _yf = yfinance
+    return _yf
+
+
+def _build_session() -> None:
+    global _session, _session_backend
+    try:
+        import yfinance.data as yf_data_module
+    except ImportError:  # pragma: no cover - older yfinance releases
+        return
+    http = getattr(yf_data_module, "requests", None)
+    if http is not None and http.__name__.startswith("curl_cffi"):
+        # curl_cffi keeps a curl handle (and its connections) per thread.
+        _session = http.Session(impersonate="chrome")
+        _session_backend = "curl_cffi"
+        return
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    _session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4, pool_maxsize=PROVIDER_POOL_CONNECTIONS, pool_block=False
+    )
+    _session.mount("https://", adapter)
+    _session_backend = "requests"
+
+
+def _session_kwargs() -> Dict[str, Any]:
+    return {"session": _session} if _session is not None else {}
+
+
+class _CallThreads:
+    """Long-lived daemon threads that run provider calls.
+
+    Reusing threads keeps curl_cffi's per-thread handles, and the keep-alive
+    connections behind them, warm across calls. A thread stuck past its
+    deadline just stays busy; a new one starts whenever none is idle.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.tasks: "queue.Queue[Tuple[Callable[[], Any], Dict[str, Any], threading.Event]]" = (
+            queue.Queue()
+        )
+        self.idle = 0
+        self.threads = 0
+        self.calls = 0
+
+    def submit(self, call: Callable[[], Any]) -> Tuple[Dict[str, Any], threading.Event]:
+        outcome: Dict[str, Any] = {}
+        finished = threading.Event()
+        with self.lock:
+            self.calls += 1
+            if self.idle:
+                self.idle -= 1
+            else:
+                self.threads += 1
+                threading.Thread(
+                    target=self._run, name=f"provider-{self.threads}", daemon=True
+                ).start()
+        self.tasks.put((call, outcome, finished))
+        return outcome, finished
+
+    def _run(self) -> None:
+        while True:
+            call, outcome, finished = self.tasks.get()
+            try:
+                outcome["value"] = call()
+            except BaseException as error:  # noqa: BLE001 - re-raised on the caller's thread
+                outcome["error"] = error
+            finally:
+                finished.set()
+            with self.lock:
+                self.idle += 1
+
+
+_call_threads = _CallThreads()
+
+
+def session_stats() -> Dict[str, Any]:
+    """Process-wide reuse counters for the shared provider session."""
+    with _call_threads.lock:
+        calls, threads = _call_threads.calls, _call_threads.threads
+    stats: Dict[str, Any] = {
+        "backend": _session_backend,
+        "sessions_created": int(_session is not None),
+        "calls": calls,
+        "call_threads": threads,
+        "calls_per_thread": round(calls / threads, 1) if threads else 0.0,
+    }
+    if _session_backend == "requests":
+        manager = _session.get_adapter("https://").poolmanager
+        pools = [manager.pools[key] for key in manager.pools.keys()]
+        opened = sum(pool.num_connections for pool in pools)
+        requests_sent = sum(pool.num_requests for pool in pools)
+        stats["connections_opened"] = opened
+        stats["connection_reuse_pct"] = (
+            round((1.0 - opened / requests_sent) * 100.0, 2) if requests_sent else 0.0
+        )
+    return stats
+
+
+def _translate(error: Exception) -> Exception:
+    if _rate_limit_error is not None and isinstance(error, _rate_limit_error):
+        return ProviderRateLimitError(str(error))
+    return error
+
+
+def _socket_timeout() -> Dict[str, float]:
+    return {"timeout": PROVIDER_TIMEOUT_SECONDS} if PROVIDER_TIMEOUT_SECONDS > 0 else {}
+
+
+def _with_deadline(call: Callable[[], T], label: str) -> T:
+    outcome, finished = _call_threads.submit(call)
+    if not finished.wait(PROVIDER_TIMEOUT_SECONDS if PROVIDER_TIMEOUT_SECONDS > 0 else None):
+        raise ProviderTimeoutError(f"{label} exceeded {PROVIDER_TIMEOUT_SECONDS:g}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
+
+
+def search_quotes(query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+    yf = _load()
+    try:
+        search = _with_deadline(
+            lambda: yf.Search(
+                query, max_results=max_results, **_session_kwargs(), **_socket_timeout()
+            ),
+            "search",
+        )
+    except Exception as error:  # noqa: BLE001
+        translated = _translate(error)
+        if translated is error:
+            raise
+        raise translated from error
+    quotes = search.quotes if isinstance(search.quotes, list) else []
+    return [quote for quote in quotes if isinstance(quote, dict)]
+
+
+def has_recent_history(symbol: str) -> bool:
+    yf = _load()
+    try:
+        history = _with_deadline(
+            lambda: yf.Ticker(symbol, **_session_kwargs()).history(
+                period="5d", interval="1d", auto_adjust=False, actions=False, **_socket_timeout()
+            ),
+            "history",
+        )
+    except Exception as error:  # noqa: BLE001
+        translated = _translate(error)
+        if translated is error:
+            raise
+        raise translated from error
+    return hasattr(history, "empty") and not history.empty
+
+
+def fetch_sector_name(symbol: str, mode: str = "profile") -> Optional[str]:
+    yf = _load()
+    try:
+        if mode == "info" or _yf_data is None:
+            # .info takes no timeout argument; only the deadline bounds it.
+            info = _with_deadline(lambda: yf.Ticker(symbol, **_session_kwargs()).info, "info") or {}
+            return info.get("sector")
+
+        # quoteSummary is per-symbol; asking only for summaryProfile skips the
+        # financial/statistics modules and the extra v7 quote call behind .info.
+        payload = _with_deadline(
+            lambda: _yf_data(**_session_kwargs()).get_raw_json(
+                QUOTE_SUMMARY_URL + symbol,
+                params={
+                    "modules": "summaryProfile",
+                    "formatted": "false",
+                    "symbol": symbol,
+                    "corsDomain": "finance.yahoo.com",
+                },
+                **_socket_timeout(),
+            ),
+            "profile",
+        )
+    except Exception as error:  # noqa: BLE001
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+        if status_code == 429:
+            raise ProviderRateLimitError(str(error)) from error
+        if status_code == 404:
+            return None
+        translated = _translate(error)
+        if translated is error:
+            raise
+        raise translated from error
+
+    results = ((payload or {}).get("quoteSummary") or {}).get("result") or []
+    profile = (results[0] or {}).get("summaryProfile") if results else None
+    return (profile or {}).get("sector")
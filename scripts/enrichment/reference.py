@@ -0,0 +1,306 @@
+"""Offline CUSIP/ticker resolution from SEC and user-supplied reference files."""
+
+import csv
+import glob
+import json
+import mmap
+import os
+import pickle
+import re
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .gics import normalize_ticker_for_db
+from .models import Candidate, IdentityResult
+
+
+REFERENCE_CACHE_FILE = ".reference-index.pickle"
+REFERENCE_INDEX_VERSION = 2
+CUSIP_RE = re.compile(r"^[A-Z0-9]{8,9}$")
+# CUSIP, issuer name, then the issuer description (class) column.
+THIRTEEN_F_LINE_RE = re.compile(
+    rb"^\s*([0-9A-Z]{6})\s?([0-9A-Z]{2})\s?([0-9A-Z])\s+\*?\s*(.+?)\s{2,}(.+?)(?:\s{2,}|\s*$)"
+)
+# Only these 13F lines share the issuer's listed ticker; notes, warrants,
+# rights, preferreds and units of the same issuer must not inherit it.
+COMMON_EQUITY_RE = re.compile(
+    r"^(COM|COMMON|CL [A-Z]|CLASS [A-Z]|SHS|ORD|ORDINARY|SH BEN INT|ADR|ADS|SPONSORED ADR|SPONSORED ADS|SPON ADR|SPON ADS)\b"
+)
+NON_EQUITY_TOKENS = {
+    "BOND",
+    "CALL",
+    "DBCV",
+    "DEBT",
+    "DEP",
+    "NOTE",
+    "NOTES",
+    "PFD",
+    "PREF",
+    "PREFERRED",
+    "PUT",
+    "RIGHT",
+    "RIGHTS",
+    "RT",
+    "RTS",
+    "SDCV",
+    "UNIT",
+    "UNITS",
+    "WARRANT",
+    "WARRANTS",
+    "WT",
+    "WTS",
+}
+NAME_SUFFIX_TOKENS = {
+    "AG",
+    "CO",
+    "COM",
+    "COMPANY",
+    "CORP",
+    "CORPORATION",
+    "DEL",
+    "INC",
+    "INCORPORATED",
+    "LLC",
+    "LP",
+    "LTD",
+    "LIMITED",
+    "NEW",
+    "NV",
+    "PLC",
+    "SA",
+}
+
+
+@dataclass
+class ReferenceIndex:
+    # Exact CUSIP -> ticker pairs from cusip,ticker files.
+    by_cusip: Dict[str, str]
+    # Common-equity 13F CUSIPs matched to a ticker through the issuer name.
+    by_cusip_name: Dict[str, str]
+    by_name: Dict[str, str]
+    # 13F CUSIPs of non-common lines; never resolved by name.
+    non_equity: Set[str]
+    from_cache: bool
+    load_ms: float
+
+
+def normalize_issuer_name(raw: str) -> str:
+    tokens = re.sub(r"[^A-Z0-9]+", " ", raw.upper().replace("&", " AND ")).split()
+    if tokens and tokens[0] == "THE":
+        tokens = tokens[1:]
+    while len(tokens) > 1 and tokens[-1] in NAME_SUFFIX_TOKENS:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def is_common_equity(description: str) -> bool:
+    text = re.sub(r"[^A-Z0-9]+", " ", description.upper()).strip()
+    if not COMMON_EQUITY_RE.match(text):
+        return False
+    return not NON_EQUITY_TOKENS.intersection(text.split())
+
+
+def reference_source_files(directory: str) -> List[str]:
+    patterns = ["company_tickers*.json", "13flist*.txt", "*.csv"]
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(directory, pattern)))
+    return sorted(paths)
+
+
+def reference_signature(paths: Sequence[str]) -> List[Tuple[str, int, int]]:
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def iter_mapped_lines(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for line in iter(mapped.readline, b""):
+                yield line
+
+
+def load_company_tickers(path: str, names: Dict[str, Set[str]]) -> None:
+    with open(path, "rb") as handle:
+        payload = json.loads(handle.read())
+
+    # SEC publishes both {"0": {"ticker", "title"}} and {"fields", "data"} shapes.
+    entries: List[Tuple[str, str]] = []
+    if isinstance(payload, dict) and isinstance(payload.get("data"), list):
+        fields = [str(field) for field in payload.get("fields") or []]
+        if "ticker" in fields and "name" in fields:
+            ticker_idx = fields.index("ticker")
+            name_idx = fields.index("name")
+            for row in payload["data"]:
+                entries.append((str(row[ticker_idx] or ""), str(row[name_idx] or "")))
+    elif isinstance(payload, dict):
+        for row in payload.values():
+            if isinstance(row, dict):
+                entries.append((str(row.get("ticker") or ""), str(row.get("title") or "")))
+
+    for ticker, title in entries:
+        name = normalize_issuer_name(title)
+        if ticker and name:
+            names.setdefault(name, set()).add(ticker.strip().upper())
+
+
+def load_13f_list(
+    path: str, issuer_by_cusip: Dict[str, str], non_equity: Set[str]
+) -> None:
+    for line in iter_mapped_lines(path):
+        match = THIRTEEN_F_LINE_RE.match(line)
+        if not match:
+            continue
+        cusip = (match.group(1) + match.group(2) + match.group(3)).decode("ascii")
+        issuer_name = match.group(4).decode("latin-1").strip()
+        description = match.group(5).decode("latin-1").strip()
+        if not is_common_equity(description):
+            non_equity.add(cusip)
+        elif issuer_name:
+            issuer_by_cusip.setdefault(cusip, issuer_name)
+
+
+def load_cusip_ticker_csv(path: str, by_cusip: Dict[str, str]) -> None:
+    lines = (line.decode("utf-8", "replace") for line in iter_mapped_lines(path))
+    reader = csv.reader(lines)
+    header = [column.strip().lower() for column in next(reader, [])]
+    if "cusip" not in header or "ticker" not in header:
+        return
+    cusip_idx = header.index("cusip")
+    ticker_idx = header.index("ticker")
+    for row in reader:
+        if len(row) <= max(cusip_idx, ticker_idx):
+            continue
+        cusip = row[cusip_idx].strip().upper()
+        ticker = row[ticker_idx].strip().upper()
+        if CUSIP_RE.fullmatch(cusip) and ticker:
+            by_cusip.setdefault(cusip, sys.intern(ticker))
+
+
+def build_reference_index(
+    paths: Sequence[str],
+) -> Tuple[Dict[str, str], Dict[str, str], Dict[str, str], Set[str]]:
+    by_cusip: Dict[str, str] = {}
+    names: Dict[str, Set[str]] = {}
+    issuer_by_cusip: Dict[str, str] = {}
+    non_equity: Set[str] = set()
+
+    for path in paths:
+        base = os.path.basename(path)
+        if base.startswith("company_tickers") and base.endswith(".json"):
+            load_company_tickers(path, names)
+        elif base.startswith("13flist") and base.endswith(".txt"):
+            load_13f_list(path, issuer_by_cusip, non_equity)
+        elif base.endswith(".csv"):
+            load_cusip_ticker_csv(path, by_cusip)
+
+    # Names shared by several tickers (share classes, re-used titles) are ambiguous.
+    by_name = {
+        name: sys.intern(next(iter(tickers)))
+        for name, tickers in names.items()
+        if len(tickers) == 1
+    }
+    by_cusip_name: Dict[str, str] = {}
+    for cusip, issuer_name in issuer_by_cusip.items():
+        ticker = by_name.get(normalize_issuer_name(issuer_name))
+        if ticker and cusip not in by_cusip:
+            by_cusip_name[cusip] = ticker
+    return by_cusip, by_cusip_name, by_name, non_equity - by_cusip.keys()
+
+
+def load_reference_index(directory: str) -> Optional[ReferenceIndex]:
+    if not directory or not os.path.isdir(directory):
+        return None
+    paths = reference_source_files(directory)
+    if not paths:
+        return None
+
+    started = time.time()
+    signature = [REFERENCE_INDEX_VERSION, reference_signature(paths)]
+    cache_path = os.path.join(directory, REFERENCE_CACHE_FILE)
+    try:
+        with open(cache_path, "rb") as handle:
+            cached = pickle.load(handle)
+        if cached.get("signature") == signature:
+            return ReferenceIndex(
+                cached["by_cusip"],
+                cached["by_cusip_name"],
+                cached["by_name"],
+                cached["non_equity"],
+                True,
+                (time.time() - started) * 1000.0,
+            )
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, KeyError):
+        pass
+
+    by_cusip, by_cusip_name, by_name, non_equity = build_reference_index(paths)
+    try:
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as handle:
+            pickle.dump(
+                {
+                    "signature": signature,
+                    "by_cusip": by_cusip,
+                    "by_cusip_name": by_cusip_name,
+                    "by_name": by_name,
+                    "non_equity": non_equity,
+                },
+                handle,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, cache_path)
+    except OSError as error:
+        print(f"[reference] cache write skipped: {error}")
+    return ReferenceIndex(
+        by_cusip,
+        by_cusip_name,
+        by_name,
+        non_equity,
+        False,
+        (time.time() - started) * 1000.0,
+    )
+
+
+def resolve_from_reference(
+    candidates: Iterable[Candidate],
+    index: Optional[ReferenceIndex],
+    resolved: List[IdentityResult],
+) -> Iterator[Candidate]:
+    """Append reference hits to ``resolved`` and lazily yield the remainder.
+
+    Only exact CUSIP files give ``resolved_reference_cusip``; anything matched
+    through an issuer name is ``resolved_reference_name``. CUSIPs the 13F list
+    marks as non-common (notes, warrants, preferreds...) are never resolved by
+    name and go on to the provider search.
+    """
+    for candidate in candidates:
+        if index is None:
+            yield candidate
+            continue
+        reason = "resolved_reference_cusip"
+        ticker = index.by_cusip.get(candidate.cusip)
+        if not ticker and candidate.cusip not in index.non_equity:
+            reason = "resolved_reference_name"
+            ticker = index.by_cusip_name.get(candidate.cusip)
+            if not ticker and candidate.issuer_name:
+                ticker = index.by_name.get(normalize_issuer_name(candidate.issuer_name))
+        db_symbol = normalize_ticker_for_db(ticker) if ticker else None
+        if not ticker or not db_symbol:
+            yield candidate
+            continue
+        resolved.append(
+            IdentityResult(
+                candidate.cusip,
+                candidate.issuer_name,
+                ticker.replace(".", "-"),
+                db_symbol,
+                reason,
+            )
+        )
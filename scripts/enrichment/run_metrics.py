@@ -0,0 +1,56 @@
+"""Persist run summaries to ``enrichment_run_metrics`` for perf-check."""
+
+import json
+from typing import Any, Dict
+
+from .db import run_psql_script, sql_literal
+from .settings import RUN_METRICS
+
+
+def record_run(command: str, run_summary: Dict[str, Any]) -> None:
+    """Store one ``run_summary`` block; a failed insert never fails the run."""
+    if not RUN_METRICS:
+        return
+    sql = f"""
+with incoming(s) as (
+  select {sql_literal(json.dumps(run_summary))}::jsonb
+)
+insert into public.enrichment_run_metrics (
+  command,
+  shard,
+  shard_count,
+  dry_run,
+  terminated,
+  stop_reason,
+  candidates_total,
+  elapsed_seconds,
+  requests_total,
+  request_429_ratio_pct,
+  latency_p95_ms,
+  identity_throughput_per_sec,
+  sector_throughput_per_sec,
+  db_write_time_ms,
+  summary
+)
+select
+  {sql_literal(command)},
+  s->>'shard',
+  coalesce((s->>'shards_total')::integer, 1),
+  coalesce((s->>'dry_run')::boolean, false),
+  coalesce((s->>'terminated')::boolean, false),
+  nullif(s->'adaptive'->>'stop_reason', ''),
+  (s->>'candidates_total')::integer,
+  (s->>'elapsed_seconds')::double precision,
+  coalesce((s->>'requests_total')::integer, 0),
+  (s->>'request_429_ratio_pct')::double precision,
+  (s->>'latency_p95_ms')::double precision,
+  (s->>'identity_throughput_per_sec')::double precision,
+  (s->>'sector_throughput_per_sec')::double precision,
+  (s->>'db_write_time_ms')::double precision,
+  s
+from incoming;
+"""
+    try:
+        run_psql_script(sql)
+    except RuntimeError as error:
+        print(f"[run-metrics] summary not recorded: {error}")
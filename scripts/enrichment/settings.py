@@ -0,0 +1,143 @@
+"""Environment knobs shared across enrichment commands.
+
+Command-specific knobs (``YF_*`` for ``sectors``, the ticker-refresh delay and
+retry settings) stay next to the command that reads them.
+"""
+
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+
+DB_CONTAINER = os.getenv("SUPABASE_DB_CONTAINER", "supabase_db_whaleinsight-pro-mvp")
+DB_NAME = os.getenv("SUPABASE_DB_NAME", "postgres")
+DB_USER = os.getenv("SUPABASE_DB_USER", "postgres")
+PSQL_FETCH_COUNT = max(
+    1,
+    int(
+        os.getenv("YH_PSQL_FETCH_COUNT")
+        or os.getenv("YF_PSQL_FETCH_COUNT")
+        or "1000"
+    ),
+)
+
+SYMBOL_LIMIT = max(0, int(os.getenv("YH_SYMBOL_LIMIT", "0")))
+
+SEARCH_WORKERS = max(1, int(os.getenv("YH_SEARCH_WORKERS", "2")))
+SECTOR_WORKERS = max(1, int(os.getenv("YH_SECTOR_WORKERS", "3")))
+SEARCH_WORKERS_MAX = max(
+    SEARCH_WORKERS, int(os.getenv("YH_SEARCH_WORKERS_MAX", str(SEARCH_WORKERS + 2)))
+)
+SECTOR_WORKERS_MAX = max(
+    SECTOR_WORKERS, int(os.getenv("YH_SECTOR_WORKERS_MAX", str(SECTOR_WORKERS + 2)))
+)
+
+SEARCH_DELAY_MS = max(40, int(os.getenv("YH_SEARCH_DELAY_MS", "180")))
+SECTOR_DELAY_MS = max(60, int(os.getenv("YH_SECTOR_DELAY_MS", "220")))
+SEARCH_DELAY_MIN_MS = max(20, int(os.getenv("YH_SEARCH_DELAY_MIN_MS", "80")))
+SECTOR_DELAY_MIN_MS = max(20, int(os.getenv("YH_SECTOR_DELAY_MIN_MS", "100")))
+SEARCH_DELAY_MAX_MS = max(
+    SEARCH_DELAY_MS, int(os.getenv("YH_SEARCH_DELAY_MAX_MS", "1200"))
+)
+SECTOR_DELAY_MAX_MS = max(
+    SECTOR_DELAY_MS, int(os.getenv("YH_SECTOR_DELAY_MAX_MS", "1500"))
+)
+
+SEARCH_RETRY_MAX = max(1, int(os.getenv("YH_SEARCH_RETRY_MAX", "3")))
+SECTOR_RETRY_MAX = max(1, int(os.getenv("YH_SECTOR_RETRY_MAX", "3")))
+SECTOR_FETCH_MODE = (os.getenv("YH_SECTOR_FETCH_MODE", "profile") or "profile").strip().lower()
+# Hedged identity searches: once a search outlives this percentile of recent
+# search latencies, a duplicate is sent if a token is free (0 disables).
+HEDGE_PERCENTILE = min(99.0, max(0.0, float(os.getenv("YH_HEDGE_PERCENTILE", "0"))))
+HEDGE_MIN_SAMPLES = max(5, int(os.getenv("YH_HEDGE_MIN_SAMPLES", "30")))
+HEDGE_SAMPLE_WINDOW = 500
+# Wall-clock limit for one provider call (search, quote profile, history); 0 disables.
+PROVIDER_TIMEOUT_SECONDS = max(0.0, float(os.getenv("YH_PROVIDER_TIMEOUT_SECONDS", "20")))
+# Keep-alive connections per host in the shared provider session (requests backend).
+PROVIDER_POOL_CONNECTIONS = max(1, int(os.getenv("YH_PROVIDER_POOL_CONNECTIONS", "16")))
+# Active sector rows updated within this many days are not refetched (0 = always refetch).
+SECTOR_TTL_DAYS = max(0.0, float(os.getenv("YH_SECTOR_TTL_DAYS", "30")))
+
+GLOBAL_RPS = max(0.2, float(os.getenv("YH_GLOBAL_RPS", "1.5")))
+GLOBAL_BURST = max(1, int(os.getenv("YH_GLOBAL_BURST", "3")))
+GLOBAL_RPS_MIN = max(0.1, float(os.getenv("YH_GLOBAL_RPS_MIN", "0.6")))
+# Host-wide token bucket shared by every enrichment job; "off" keeps buckets per process.
+RATE_STATE_FILE = (
+    os.getenv("YH_RATE_STATE_FILE")
+    or os.path.join(tempfile.gettempdir(), "whale-radar-yahoo-rate.bin")
+).strip()
+if RATE_STATE_FILE.lower() in {"off", "none", "0"}:
+    RATE_STATE_FILE = ""
+SHARED_COOLDOWN_SECONDS = max(0.0, float(os.getenv("YH_SHARED_COOLDOWN_SECONDS", "5")))
+
+ADAPT_WINDOW_REQUESTS = max(30, int(os.getenv("YH_ADAPT_WINDOW_REQUESTS", "120")))
+ADAPT_429_THRESHOLD = max(0.0, float(os.getenv("YH_ADAPT_429_THRESHOLD", "0.03")))
+ADAPT_DELAY_STEP_MS = max(20, int(os.getenv("YH_ADAPT_DELAY_STEP_MS", "80")))
+HEALTHY_WINDOWS_TO_SCALE_UP = max(
+    1, int(os.getenv("YH_HEALTHY_WINDOWS_TO_SCALE_UP", "3"))
+)
+MAX_CONSECUTIVE_THROTTLED_WINDOWS = max(
+    1, int(os.getenv("YH_MAX_CONSECUTIVE_THROTTLED_WINDOWS", "6"))
+)
+COOLDOWN_SECONDS = max(2, int(os.getenv("YH_COOLDOWN_SECONDS", "15")))
+# After SIGINT/SIGTERM, wait this long for in-flight lookups before flushing.
+SHUTDOWN_GRACE_SECONDS = max(0.0, float(os.getenv("YH_SHUTDOWN_GRACE_SECONDS", "10")))
+
+BATCH_SIZE = max(10, int(os.getenv("YH_BATCH_SIZE", "100")))
+# identity streams candidates through lookup and write stages this many at a time.
+CANDIDATE_CHUNK_SIZE = max(BATCH_SIZE, int(os.getenv("YH_CANDIDATE_CHUNK_SIZE", "2000")))
+# "batches" commits each BATCH_SIZE write on its own; "transaction" runs every
+# batch of one apply call in a single transaction with per-batch savepoints.
+APPLY_MODE = (os.getenv("YH_APPLY_MODE", "batches") or "batches").strip().lower()
+
+IDENTITY_SOURCE_VERSION = os.getenv("IDENTITY_SOURCE_VERSION", "yahoo-search-cusip-v1")
+REFERENCE_SOURCE_VERSION = os.getenv("REFERENCE_SOURCE_VERSION", "reference-file-v1")
+REFERENCE_DIR = (os.getenv("YH_REFERENCE_DIR", "data/reference") or "").strip()
+SECTOR_SOURCE_VERSION = os.getenv("SECTOR_SOURCE_VERSION", "yfinance-info-v1")
+
+# Where --dry-run writes plan files when --plan-out is not given.
+PLAN_DIR = (os.getenv("YH_PLAN_DIR", ".enrichment/plans") or ".enrichment/plans").strip()
+# --profile output root and the stack sampler interval.
+PROFILE_DIR = (os.getenv("YH_PROFILE_DIR", ".enrichment/profiles") or ".enrichment/profiles").strip()
+PROFILE_SAMPLE_MS = max(1.0, float(os.getenv("YH_PROFILE_SAMPLE_MS", "5")))
+# Ticker liveness answers reused across runs; "off" memoizes within a run only.
+LIVENESS_CACHE_FILE = (
+    os.getenv("YH_LIVENESS_CACHE_FILE") or ".enrichment/liveness-memo.json"
+).strip()
+if LIVENESS_CACHE_FILE.lower() in {"off", "none", "0"}:
+    LIVENESS_CACHE_FILE = ""
+LIVENESS_TTL_HOURS = max(0.0, float(os.getenv("YH_LIVENESS_TTL_HOURS", "12")))
+
+# identity run summaries are stored in enrichment_run_metrics unless "off".
+RUN_METRICS = (os.getenv("YH_RUN_METRICS", "on") or "on").strip().lower() not in {"off", "none", "0"}
+
+
+def parse_universe(raw: str) -> Optional[int]:
+    """Parse ``top:N`` (or bare ``N``) into a filer rank cutoff; ``all`` gives None."""
+    value = raw.strip().lower()
+    if value in {"all", "*"}:
+        return None
+    return max(1, int(value.split(":", 1)[-1]))
+
+
+def parse_revalidate_tiers(raw: str) -> List[Tuple[float, float]]:
+    """Parse ``min_value:max_age_days,...`` into (value, days), highest value first."""
+    if raw.strip().lower() in {"", "off", "none", "0"}:
+        return []
+    tiers = []
+    for part in raw.split(","):
+        value, days = part.split(":", 1)
+        tiers.append((float(value), float(days)))
+    return sorted(tiers, reverse=True)
+
+
+# Filers whose holdings are enriched: the top N by reported value, or all of them.
+UNIVERSE_TOP_N = parse_universe(os.getenv("YH_UNIVERSE", "top:50") or "top:50")
+# Also take CUSIPs from each filer's earlier filings within its last K quarters.
+UNIVERSE_QUARTERS = max(1, int(os.getenv("YH_UNIVERSE_QUARTERS", "1")))
+
+# Active identities are re-checked once older than the tier for their position
+# value (USD thousands, summed over the universe's latest holdings); "off" re-checks all.
+REVALIDATE_TIERS = parse_revalidate_tiers(
+    os.getenv("YH_REVALIDATE_TIERS", "1000000:1,100000:7,0:30")
+)
@@ -0,0 +1,229 @@
+"""Fan a command out over hash-partitioned shard processes and merge results."""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from .candidates import Shard
+from .run_metrics import record_run
+from .settings import RATE_STATE_FILE
+from .shutdown import GracefulShutdown
+
+
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_shard(value: str) -> Shard:
+    try:
+        index_text, count_text = value.split("/", 1)
+        index, count = int(index_text), int(count_text)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError("expected INDEX/COUNT, e.g. 0/4") from error
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in [0, {count})")
+    return index, count
+
+
+def format_shard(shard: Shard) -> str:
+    return f"{shard[0]}/{shard[1]}"
+
+
+def _relay(stream: Any, prefix: str) -> None:
+    for line in stream:
+        sys.stdout.write(prefix + line)
+        sys.stdout.flush()
+
+
+def run_shards(
+    command: str, shard_count: int, extra_args: Sequence[str]
+) -> List[Optional[Dict[str, Any]]]:
+    """Run ``command`` once per shard with one shared rate-limit state file.
+
+    The host-wide bucket is used when enabled, so shards also share their
+    budget with other enrichment jobs; otherwise a private file is created.
+
+    Child output is relayed line by line with a ``[shard i/N]`` prefix. Each
+    child writes its structured summary to a file; ``None`` marks a shard that
+    failed before writing one.
+
+    Children run in their own session, so a terminal Ctrl-C reaches only this
+    process, which relays the first SIGINT/SIGTERM once to every live shard;
+    each shard then flushes what it has and still writes its summary.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in [PACKAGE_PARENT, env.get("PYTHONPATH", "")] if path
+    )
+    # Only the merged summary is recorded for perf-check, not each shard's.
+    env["YH_RUN_METRICS"] = "off"
+
+    with tempfile.TemporaryDirectory(prefix="enrichment-shards-") as work_dir:
+        rate_state = RATE_STATE_FILE or os.path.join(work_dir, "rate-limit.bin")
+        running = []
+        for index in range(shard_count):
+            shard_label = format_shard((index, shard_count))
+            summary_path = os.path.join(work_dir, f"summary-{index}.json")
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "enrichment",
+                    command,
+                    "--shard",
+                    shard_label,
+                    "--rate-state",
+                    rate_state,
+                    "--summary-out",
+                    summary_path,
+                    *extra_args,
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                env=env,
+                start_new_session=True,
+            )
+            relay = threading.Thread(
+                target=_relay, args=(process.stdout, f"[shard {shard_label}] "), daemon=True
+            )
+            relay.start()
+            running.append((process, relay, summary_path))
+
+        def relay_signal(name: str) -> None:
+            for process, _, _ in running:
+                if process.poll() is None:
+                    process.send_signal(signal.Signals[name])
+
+        shutdown = GracefulShutdown(relay_signal).install()
+        summaries: List[Optional[Dict[str, Any]]] = []
+        try:
+            for process, relay, summary_path in running:
+                # Signals are relayed from here, not from the handler.
+                while process.poll() is None:
+                    shutdown.poll()
+                    time.sleep(0.2)
+                shutdown.poll()
+                relay.join()
+                # Shards write their summary last, so a readable file means the
+                # shard finished, even if it exited non-zero after a signal.
+                try:
+                    with open(summary_path, "r", encoding="utf-8") as handle:
+                        summary = json.load(handle)
+                except (OSError, ValueError):
+                    summary = None
+                summaries.append(summary)
+        finally:
+            shutdown.restore()
+        return summaries
+
+
+def merge_run_summaries(
+    summaries: Sequence[Optional[Dict[str, Any]]], elapsed_seconds: float
+) -> Dict[str, Any]:
+    """Combine per-shard ``run_summary`` blocks into one report.
+
+    Counters are summed and rates are recomputed over the parent wall time.
+    Shard p95s cannot be combined exactly, so the worst shard p95 is reported.
+    """
+    runs = [summary["run_summary"] for summary in summaries if summary]
+    elapsed_seconds = max(0.001, elapsed_seconds)
+    requests_total = sum(run["requests_total"] for run in runs)
+    requests_429 = sum(run["requests_429"] for run in runs)
+    latency_weighted = sum(run["latency_avg_ms"] * run["requests_total"] for run in runs)
+
+    def summed(key: str) -> Any:
+        return sum(run.get(key, 0) for run in runs)
+
+    def hedged(key: str) -> int:
+        return sum(run.get("hedging", {}).get(key, 0) for run in runs)
+
+    def session(key: str) -> int:
+        return sum(run.get("provider_session", {}).get(key, 0) for run in runs)
+
+    def rate(key: str) -> float:
+        return round(
+            sum(run[key] * run["elapsed_seconds"] for run in runs) / elapsed_seconds, 3
+        )
+
+    return {
+        "run_summary": {
+            "dry_run": any(run["dry_run"] for run in runs),
+            "elapsed_seconds": round(elapsed_seconds, 2),
+            "candidates_total": summed("candidates_total"),
+            "requests_total": requests_total,
+            "requests_429": requests_429,
+            "requests_5xx": summed("requests_5xx"),
+            "requests_timeout": summed("requests_timeout"),
+            "request_429_ratio_pct": round((requests_429 / requests_total) * 100.0, 2)
+            if requests_total
+            else 0.0,
+            "latency_avg_ms": round(latency_weighted / requests_total, 2)
+            if requests_total
+            else 0.0,
+            "latency_p95_ms": max((run["latency_p95_ms"] for run in runs), default=0.0),
+            "identity_throughput_per_sec": rate("identity_throughput_per_sec"),
+            "sector_throughput_per_sec": rate("sector_throughput_per_sec"),
+            "db_write_time_ms": round(summed("db_write_time_ms"), 2),
+            "db_rows_failed": summed("db_rows_failed"),
+            "reference_resolved": summed("reference_resolved"),
+            "sector_info_calls_avoided": summed("sector_info_calls_avoided"),
+            "sector_fresh_skipped": summed("sector_fresh_skipped"),
+            "sector_unchanged": summed("sector_unchanged"),
+            "hedging": {
+                "eligible_searches": hedged("eligible_searches"),
+                "hedges_sent": hedged("hedges_sent"),
+                "hedge_wins": hedged("hedge_wins"),
+                "hedge_win_rate_pct": round(hedged("hedge_wins") / hedged("hedges_sent") * 100.0, 2)
+                if hedged("hedges_sent")
+                else 0.0,
+                "extra_load_pct": round(
+                    hedged("hedges_sent") / hedged("eligible_searches") * 100.0, 2
+                )
+                if hedged("eligible_searches")
+                else 0.0,
+                "skipped_no_token": hedged("skipped_no_token"),
+            },
+            "terminated": any(run.get("terminated") for run in runs),
+            "provider_session": {
+                "sessions_created": session("sessions_created"),
+                "calls": session("calls"),
+                "call_threads": session("call_threads"),
+            },
+            "adaptive": {
+                "global_rps_final": min(
+                    (run["adaptive"]["global_rps_final"] for run in runs), default=0.0
+                ),
+                "stop_requested": any(run["adaptive"]["stop_requested"] for run in runs),
+            },
+            "plan_paths": [run["plan_path"] for run in runs if run.get("plan_path")],
+            "shards_total": len(summaries),
+            "shards_failed": sum(1 for summary in summaries if not summary),
+            "shards": [
+                {
+                    "shard": run.get("shard"),
+                    "elapsed_seconds": run["elapsed_seconds"],
+                    "requests_total": run["requests_total"],
+                    "requests_429": run["requests_429"],
+                    "adaptive": run["adaptive"],
+                }
+                for run in runs
+            ],
+        }
+    }
+
+
+def run_and_merge(command: str, shard_count: int, extra_args: Sequence[str]) -> int:
+    started = time.time()
+    summaries = run_shards(command, shard_count, extra_args)
+    merged = merge_run_summaries(summaries, time.time() - started)
+    print("Structured summary:")
+    print(json.dumps(merged, indent=2))
+    record_run(command, merged["run_summary"])
+    return 0 if all(summaries) and not merged["run_summary"]["terminated"] else 1
@@ -0,0 +1,74 @@
+"""Turn the first SIGINT/SIGTERM into a graceful stop; a second one aborts."""
+
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .settings import SHUTDOWN_GRACE_SECONDS
+
+
+HANDLED_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class GracefulShutdown:
+    """Records the first termination signal; ``poll`` then calls ``on_signal`` once.
+
+    The previous handlers are restored as soon as the first signal arrives,
+    so a second Ctrl-C or SIGTERM behaves exactly as it did before. The
+    handler itself only records the signal: it runs on the main thread at an
+    arbitrary point, where taking a lock the main thread already holds would
+    deadlock and printing could re-enter a stdout write. Dispatch loops call
+    ``poll`` from normal code and give in-flight work until ``remaining()``
+    hits 0.
+    """
+
+    def __init__(self, on_signal: Callable[[str], None]) -> None:
+        self.on_signal = on_signal
+        self.signal_name: Optional[str] = None
+        self.signal_number = 0
+        self.deadline = 0.0
+        self.abandoned = 0
+        self._notified = False
+        self._previous: Dict[int, Any] = {}
+
+    def install(self) -> "GracefulShutdown":
+        # Handlers can only be installed from the main thread.
+        if threading.current_thread() is threading.main_thread():
+            for signum in HANDLED_SIGNALS:
+                self._previous[signum] = signal.signal(signum, self._handle)
+        return self
+
+    def restore(self) -> None:
+        for signum, handler in self._previous.items():
+            signal.signal(signum, handler)
+        self._previous = {}
+
+    def _handle(self, signum: int, _frame: Any) -> None:
+        self.restore()
+        self.signal_number = signum
+        self.signal_name = signal.Signals(signum).name
+        self.deadline = time.time() + SHUTDOWN_GRACE_SECONDS
+
+    def poll(self) -> bool:
+        """Act on a recorded signal once, outside the handler; returns ``requested``."""
+        if self.signal_name is not None and not self._notified:
+            self._notified = True
+            print(
+                f"[shutdown] {self.signal_name} received; finishing in-flight work for up to "
+                f"{SHUTDOWN_GRACE_SECONDS:g}s before flushing (send again to abort)",
+                flush=True,
+            )
+            self.on_signal(self.signal_name)
+        return self.requested
+
+    @property
+    def requested(self) -> bool:
+        return self.signal_name is not None
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.time()) if self.requested else float("inf")
+
+    @property
+    def exit_code(self) -> int:
+        return 128 + self.signal_number if self.requested else 0
@@ -385,6 +385,20 @@ async function refreshWhaleSnapshots(config) {
   return rows[0] ?? null;
 }
 
+async function refreshEnrichmentCandidateSnapshot(config) {
+  return supabaseRest(config, "rpc/refresh_enrichment_candidate_snapshot", {
+    method: "POST",
+    body: {}
+  });
+}
+
+async function enqueueEnrichmentCandidateJobs(config) {
+  return supabaseRest(config, "rpc/enqueue_enrichment_candidate_jobs", {
+    method: "POST",
+    body: {}
+  });
+}
+
 async function main() {
   const args = parseCliArgs(process.argv.slice(2));
   const config = resolveConfig();
@@ -517,6 +531,22 @@ async function main() {
       const message = error instanceof Error ? error.message : String(error);
       console.log(`[warn] whale snapshot refresh failed: ${message}`);
     }
+
+    try {
+      const candidateResult = await refreshEnrichmentCandidateSnapshot(config);
+      console.log("[snapshots] refreshed enrichment candidates", candidateResult ?? {});
+    } catch (error) {
+      const message = error instanceof Error ? error.message : String(error);
+      console.log(`[warn] enrichment candidate refresh failed: ${message}`);
+    }
+
+    try {
+      const jobResult = await enqueueEnrichmentCandidateJobs(config);
+      console.log("[jobs] enqueued enrichment jobs", jobResult ?? {});
+    } catch (error) {
+      const message = error instanceof Error ? error.message : String(error);
+      console.log(`[warn] enrichment job enqueue failed: ${message}`);
+    }
   }
 }
 
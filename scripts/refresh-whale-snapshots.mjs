@@ -20,10 +20,8 @@ function resolveConfig() {
   };
 }
 
-async function main() {
-  const config = resolveConfig();
-
-  const response = await fetch(`${config.supabaseUrl}/rest/v1/rpc/refresh_whale_snapshot_tables`, {
+async function callRpc(config, name) {
+  const response = await fetch(`${config.supabaseUrl}/rest/v1/rpc/${name}`, {
     method: "POST",
     headers: {
       apikey: config.serviceRoleKey,
@@ -35,11 +33,23 @@ async function main() {
 
   if (!response.ok) {
     const body = await response.text();
-    throw new Error(`Failed to refresh whale snapshots: ${response.status} ${body}`);
+    throw new Error(`Failed to call ${name}: ${response.status} ${body}`);
   }
 
-  const payload = await response.json();
+  return response.json();
+}
+
+async function main() {
+  const config = resolveConfig();
+
+  const payload = await callRpc(config, "refresh_whale_snapshot_tables");
   console.log("Whale snapshots refreshed:", payload);
+
+  const candidates = await callRpc(config, "refresh_enrichment_candidate_snapshot");
+  console.log("Enrichment candidate snapshot refreshed:", candidates);
+
+  const jobs = await callRpc(config, "enqueue_enrichment_candidate_jobs");
+  console.log("Enrichment jobs enqueued:", jobs);
 }
 
 main().catch((error) => {
@@ -0,0 +1,226 @@
+begin;
+
+create table if not exists public.enrichment_jobs (
+  id bigint generated always as identity primary key,
+  kind text not null check (kind in ('identity', 'sector', 'liveness')),
+  subject text not null,
+  payload jsonb not null default '{}'::jsonb,
+  status text not null default 'pending' check (status in ('pending', 'running', 'done', 'failed')),
+  attempts integer not null default 0,
+  max_attempts integer not null default 5,
+  run_after timestamptz not null default timezone('utc', now()),
+  locked_by text,
+  locked_at timestamptz,
+  last_error text,
+  result jsonb,
+  created_at timestamptz not null default timezone('utc', now()),
+  updated_at timestamptz not null default timezone('utc', now())
+);
+
+-- One open job per subject; re-enqueueing while pending or running is a no-op.
+create unique index if not exists enrichment_jobs_open_subject_idx
+  on public.enrichment_jobs (kind, subject)
+  where status in ('pending', 'running');
+
+create index if not exists enrichment_jobs_claim_idx
+  on public.enrichment_jobs (kind, run_after, id)
+  where status = 'pending';
+
+alter table public.enrichment_jobs enable row level security;
+
+create or replace function public.enqueue_enrichment_jobs(p_kind text, p_jobs jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+  enqueued integer := 0;
+begin
+  insert into public.enrichment_jobs (kind, subject, payload)
+  select distinct on (upper(trim(j->>'subject')))
+    p_kind,
+    upper(trim(j->>'subject')),
+    coalesce(j->'payload', '{}'::jsonb)
+  from jsonb_array_elements(coalesce(p_jobs, '[]'::jsonb)) j
+  where nullif(trim(j->>'subject'), '') is not null
+  on conflict (kind, subject) where status in ('pending', 'running') do nothing;
+  get diagnostics enqueued = row_count;
+
+  return enqueued;
+end;
+$$;
+
+create or replace function public.enqueue_enrichment_candidate_jobs()
+returns jsonb
+language plpgsql
+as $$
+declare
+  identity_jobs integer := 0;
+  sector_jobs integer := 0;
+begin
+  insert into public.enrichment_jobs (kind, subject, payload)
+  select
+    'identity',
+    h.cusip,
+    jsonb_build_object('issuer_name', max(h.issuer_name))
+  from public.enrichment_candidate_holdings h
+  join public.enrichment_candidate_institutions ci on ci.institution_id = h.institution_id
+  where ci.canonical_rank <= 50
+    and not exists (
+      select 1
+      from public.security_identity_map sim
+      where sim.cusip = h.cusip
+        and sim.is_active = true
+    )
+  group by h.cusip
+  on conflict (kind, subject) where status in ('pending', 'running') do nothing;
+  get diagnostics identity_jobs = row_count;
+
+  insert into public.enrichment_jobs (kind, subject, payload)
+  select
+    'sector',
+    resolved.ticker,
+    jsonb_build_object('provider_symbol', resolved.ticker, 'cusip', min(resolved.cusip))
+  from (
+    select coalesce(h.ticker, sim.ticker) as ticker, h.cusip
+    from public.enrichment_candidate_holdings h
+    left join public.security_identity_map sim
+      on sim.cusip = h.cusip
+     and sim.is_active = true
+  ) resolved
+  where resolved.ticker is not null
+    and not exists (
+      select 1
+      from public.security_sector_map ssm
+      where ssm.is_active = true
+        and (ssm.ticker = resolved.ticker or ssm.cusip = resolved.cusip)
+    )
+  group by resolved.ticker
+  on conflict (kind, subject) where status in ('pending', 'running') do nothing;
+  get diagnostics sector_jobs = row_count;
+
+  return jsonb_build_object('identity_jobs', identity_jobs, 'sector_jobs', sector_jobs);
+end;
+$$;
+
+create or replace function public.claim_enrichment_jobs(
+  p_kind text,
+  p_worker text,
+  p_limit integer,
+  p_lease_seconds integer default 600
+)
+returns setof public.enrichment_jobs
+language sql
+as $$
+  with claimable as (
+    select j.id
+    from public.enrichment_jobs j
+    where j.kind = p_kind
+      and (
+        (j.status = 'pending' and j.run_after <= timezone('utc', now()))
+        -- Leases left behind by a crashed worker become claimable again.
+        or (
+          j.status = 'running'
+          and j.locked_at < timezone('utc', now()) - make_interval(secs => p_lease_seconds)
+        )
+      )
+    order by j.run_after, j.id
+    limit greatest(p_limit, 0)
+    for update skip locked
+  )
+  update public.enrichment_jobs j
+  set
+    status = 'running',
+    attempts = j.attempts + 1,
+    locked_by = p_worker,
+    locked_at = timezone('utc', now()),
+    updated_at = timezone('utc', now())
+  from claimable
+  where j.id = claimable.id
+  returning j.*;
+$$;
+
+create or replace function public.finish_enrichment_jobs(
+  p_outcomes jsonb,
+  p_retry_base_seconds integer default 60
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+  done_jobs integer := 0;
+  retried_jobs integer := 0;
+  failed_jobs integer := 0;
+begin
+  if to_regclass('pg_temp.enrichment_job_outcomes') is not null then
+    drop table pg_temp.enrichment_job_outcomes;
+  end if;
+
+  create temporary table enrichment_job_outcomes on commit drop as
+  select
+    (o->>'id')::bigint as id,
+    o->>'outcome' as outcome,
+    o->'result' as result,
+    o->>'error' as error
+  from jsonb_array_elements(coalesce(p_outcomes, '[]'::jsonb)) o;
+
+  update public.enrichment_jobs j
+  set
+    status = 'done',
+    result = o.result,
+    last_error = null,
+    locked_by = null,
+    locked_at = null,
+    updated_at = timezone('utc', now())
+  from enrichment_job_outcomes o
+  where o.id = j.id
+    and o.outcome = 'done'
+    and j.status = 'running';
+  get diagnostics done_jobs = row_count;
+
+  -- Retries back off exponentially until max_attempts, then the job fails.
+  update public.enrichment_jobs j
+  set
+    status = 'pending',
+    run_after = timezone('utc', now())
+      + make_interval(secs => p_retry_base_seconds * power(2, greatest(j.attempts - 1, 0))),
+    last_error = o.error,
+    locked_by = null,
+    locked_at = null,
+    updated_at = timezone('utc', now())
+  from enrichment_job_outcomes o
+  where o.id = j.id
+    and o.outcome = 'retry'
+    and j.status = 'running'
+    and j.attempts < j.max_attempts;
+  get diagnostics retried_jobs = row_count;
+
+  update public.enrichment_jobs j
+  set
+    status = 'failed',
+    result = o.result,
+    last_error = o.error,
+    locked_by = null,
+    locked_at = null,
+    updated_at = timezone('utc', now())
+  from enrichment_job_outcomes o
+  where o.id = j.id
+    and o.outcome in ('retry', 'failed')
+    and j.status = 'running';
+  get diagnostics failed_jobs = row_count;
+
+  return jsonb_build_object('done', done_jobs, 'retried', retried_jobs, 'failed', failed_jobs);
+end;
+$$;
+
+comment on table public.enrichment_jobs is
+  'Work queue of identity, sector and liveness lookups claimed by enrichment workers with SKIP LOCKED.';
+comment on function public.enqueue_enrichment_jobs(text, jsonb) is
+  'Enqueues [{subject, payload}] jobs of one kind, skipping subjects that already have an open job.';
+comment on function public.enqueue_enrichment_candidate_jobs() is
+  'Enqueues identity jobs for unmapped top-50 candidate CUSIPs and sector jobs for unclassified tickers.';
+comment on function public.claim_enrichment_jobs(text, text, integer, integer) is
+  'Leases up to p_limit due jobs of one kind to a worker, skipping rows other workers hold.';
+comment on function public.finish_enrichment_jobs(jsonb, integer) is
+  'Records [{id, outcome, result, error}] worker outcomes: done, retry with backoff, or failed.';
+
+commit;
@@ -0,0 +1,96 @@
+begin;
+
+create or replace function public.enqueue_enrichment_jobs_for_new_positions()
+returns trigger
+language plpgsql
+as $$
+begin
+  insert into public.enrichment_jobs (kind, subject, payload)
+  select
+    'identity',
+    upper(trim(np.cusip)),
+    jsonb_build_object('issuer_name', max(np.issuer_name))
+  from new_positions np
+  where nullif(trim(np.cusip), '') is not null
+    and not exists (
+      select 1
+      from public.security_identity_map sim
+      where sim.cusip = upper(trim(np.cusip))
+        and sim.is_active = true
+    )
+  group by upper(trim(np.cusip))
+  on conflict (kind, subject) where status in ('pending', 'running') do nothing;
+
+  insert into public.enrichment_jobs (kind, subject, payload)
+  select
+    'sector',
+    sim.ticker,
+    jsonb_build_object('provider_symbol', sim.ticker, 'cusip', min(sim.cusip))
+  from new_positions np
+  join public.security_identity_map sim
+    on sim.cusip = upper(trim(np.cusip))
+   and sim.is_active = true
+  where not exists (
+    select 1
+    from public.security_sector_map ssm
+    where ssm.is_active = true
+      and (ssm.ticker = sim.ticker or ssm.cusip = sim.cusip)
+  )
+  group by sim.ticker
+  on conflict (kind, subject) where status in ('pending', 'running') do nothing;
+
+  return null;
+end;
+$$;
+
+-- Transition tables allow one event per trigger, so upserts need both.
+drop trigger if exists positions_enqueue_enrichment_on_insert on public.positions;
+create trigger positions_enqueue_enrichment_on_insert
+  after insert on public.positions
+  referencing new table as new_positions
+  for each statement
+  execute function public.enqueue_enrichment_jobs_for_new_positions();
+
+drop trigger if exists positions_enqueue_enrichment_on_update on public.positions;
+create trigger positions_enqueue_enrichment_on_update
+  after update on public.positions
+  referencing new table as new_positions
+  for each statement
+  execute function public.enqueue_enrichment_jobs_for_new_positions();
+
+create or replace function public.notify_enrichment_jobs()
+returns trigger
+language plpgsql
+as $$
+declare
+  counts jsonb;
+begin
+  select jsonb_object_agg(kind, jobs)
+  into counts
+  from (
+    select nj.kind, count(*) as jobs
+    from new_jobs nj
+    group by nj.kind
+  ) by_kind;
+
+  -- One notification per statement; listeners debounce and drain in batches.
+  if counts is not null then
+    perform pg_notify('enrichment_jobs', counts::text);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists enrichment_jobs_notify_on_insert on public.enrichment_jobs;
+create trigger enrichment_jobs_notify_on_insert
+  after insert on public.enrichment_jobs
+  referencing new table as new_jobs
+  for each statement
+  execute function public.notify_enrichment_jobs();
+
+comment on function public.enqueue_enrichment_jobs_for_new_positions() is
+  'Enqueues identity jobs for unmapped CUSIPs and sector jobs for unclassified tickers in ingested positions.';
+comment on function public.notify_enrichment_jobs() is
+  'Sends one enrichment_jobs NOTIFY per statement with the number of jobs enqueued per kind.';
+
+commit;
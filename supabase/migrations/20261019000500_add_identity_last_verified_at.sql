@@ -0,0 +1,22 @@
+begin;
+
+alter table public.security_identity_map
+  add column if not exists last_verified_at timestamptz;
+
+-- Existing rows count as verified when they were last written.
+update public.security_identity_map
+set last_verified_at = coalesce(updated_at, effective_from)
+where last_verified_at is null;
+
+alter table public.security_identity_map
+  alter column last_verified_at set default timezone('utc', now()),
+  alter column last_verified_at set not null;
+
+create index if not exists security_identity_map_active_verified_idx
+  on public.security_identity_map (last_verified_at asc)
+  where is_active = true;
+
+comment on column public.security_identity_map.last_verified_at is
+  'When a provider lookup last confirmed this mapping; drives value-tiered revalidation.';
+
+commit;
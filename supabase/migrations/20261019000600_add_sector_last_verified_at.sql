@@ -0,0 +1,18 @@
+begin;
+
+alter table public.security_sector_map
+  add column if not exists last_verified_at timestamptz;
+
+-- Existing rows count as verified when they were last written.
+update public.security_sector_map
+set last_verified_at = updated_at
+where last_verified_at is null;
+
+alter table public.security_sector_map
+  alter column last_verified_at set default timezone('utc', now()),
+  alter column last_verified_at set not null;
+
+comment on column public.security_sector_map.last_verified_at is
+  'When a provider lookup last confirmed this sector; drives YH_SECTOR_TTL_DAYS. updated_at only moves when the mapping changes.';
+
+commit;
@@ -0,0 +1,30 @@
+begin;
+
+create table if not exists public.enrichment_run_metrics (
+  id bigint generated always as identity primary key,
+  command text not null,
+  shard text,
+  shard_count integer not null default 1,
+  dry_run boolean not null default false,
+  terminated boolean not null default false,
+  stop_reason text,
+  elapsed_seconds double precision,
+  requests_total integer not null default 0,
+  request_429_ratio_pct double precision,
+  latency_p95_ms double precision,
+  identity_throughput_per_sec double precision,
+  sector_throughput_per_sec double precision,
+  db_write_time_ms double precision,
+  summary jsonb not null,
+  recorded_at timestamptz not null default timezone('utc', now())
+);
+
+create index if not exists enrichment_run_metrics_command_idx
+  on public.enrichment_run_metrics (command, id desc);
+
+alter table public.enrichment_run_metrics enable row level security;
+
+comment on table public.enrichment_run_metrics is
+  'One row per enrichment run summary; the perf-check command compares the latest run against a rolling baseline.';
+
+commit;
@@ -0,0 +1,14 @@
+begin;
+
+create table if not exists public.enrichment_lookup_attempts (
+  cusip text primary key,
+  attempts integer not null default 1,
+  last_attempt_at timestamptz not null default timezone('utc', now())
+);
+
+alter table public.enrichment_lookup_attempts enable row level security;
+
+comment on table public.enrichment_lookup_attempts is
+  'Last provider lookup per CUSIP that confirmed nothing (no identity match, or a dead ticker without replacement). Candidates are ordered by greatest(last_verified_at, last_attempt_at) so unresolvable CUSIPs do not starve revalidation under YH_SYMBOL_LIMIT.';
+
+commit;
@@ -0,0 +1,9 @@
+begin;
+
+alter table public.enrichment_run_metrics
+  add column if not exists candidates_total integer;
+
+comment on column public.enrichment_run_metrics.candidates_total is
+  'Candidates the run set out to process (after YH_SYMBOL_LIMIT); perf-check only compares runs of similar size.';
+
+commit;
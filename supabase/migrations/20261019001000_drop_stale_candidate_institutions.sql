@@ -0,0 +1,140 @@
+begin;
+
+create or replace function public.refresh_enrichment_candidate_snapshot()
+returns jsonb
+language plpgsql
+as $$
+declare
+  now_utc timestamptz := timezone('utc', now());
+  removed_institutions integer := 0;
+  removed_holdings integer := 0;
+  inserted_holdings integer := 0;
+  refreshed_institutions integer := 0;
+  reranked_institutions integer := 0;
+begin
+  if to_regclass('pg_temp.enrichment_canonical_latest') is not null then
+    drop table pg_temp.enrichment_canonical_latest;
+  end if;
+  if to_regclass('pg_temp.enrichment_changed_latest') is not null then
+    drop table pg_temp.enrichment_changed_latest;
+  end if;
+
+  create temporary table enrichment_canonical_latest on commit drop as
+  select distinct on (f.institution_id)
+    f.institution_id,
+    f.id as filing_id,
+    f.report_period
+  from public.filings f
+  where f.filing_form_type in ('13F-HR', '13F-HR/A')
+  order by f.institution_id, f.report_period desc, f.filing_date desc, f.accession_number desc;
+
+  -- 13F accessions are immutable, so a snapshot row is current while its filing is still canonical.
+  create temporary table enrichment_changed_latest on commit drop as
+  select cl.*
+  from enrichment_canonical_latest cl
+  where not exists (
+    select 1
+    from public.enrichment_candidate_institutions ci
+    where ci.institution_id = cl.institution_id
+      and ci.filing_id = cl.filing_id
+  );
+
+  delete from public.enrichment_candidate_holdings h
+  where not exists (
+    select 1
+    from enrichment_canonical_latest cl
+    where cl.institution_id = h.institution_id
+      and cl.filing_id = h.filing_id
+  );
+  get diagnostics removed_holdings = row_count;
+
+  -- Drop every row whose filing is no longer canonical, not just rows of
+  -- institutions without filings: a newer canonical filing with no positions
+  -- would otherwise leave the old filing_id and total ranking forever.
+  -- Changed filings that do have positions are re-inserted below.
+  delete from public.enrichment_candidate_institutions ci
+  where not exists (
+    select 1
+    from enrichment_canonical_latest cl
+    where cl.institution_id = ci.institution_id
+      and cl.filing_id = ci.filing_id
+  );
+  get diagnostics removed_institutions = row_count;
+
+  insert into public.enrichment_candidate_holdings (
+    institution_id,
+    filing_id,
+    cusip,
+    ticker,
+    issuer_name,
+    value_usd_thousands
+  )
+  select
+    cl.institution_id,
+    cl.filing_id,
+    p.cusip,
+    max(upper(nullif(trim(p.ticker), ''))),
+    max(p.issuer_name),
+    sum(case when p.value_usd_thousands > 0 and p.shares > 0 then p.value_usd_thousands else 0 end)
+  from enrichment_changed_latest cl
+  join public.positions p on p.filing_id = cl.filing_id
+  group by cl.institution_id, cl.filing_id, p.cusip;
+  get diagnostics inserted_holdings = row_count;
+
+  insert into public.enrichment_candidate_institutions (
+    institution_id,
+    filing_id,
+    report_period,
+    total_value_usd_thousands,
+    canonical_rank,
+    refreshed_at
+  )
+  select
+    cl.institution_id,
+    cl.filing_id,
+    cl.report_period,
+    sum(h.value_usd_thousands),
+    0,
+    now_utc
+  from enrichment_changed_latest cl
+  join public.enrichment_candidate_holdings h on h.institution_id = cl.institution_id
+  group by cl.institution_id, cl.filing_id, cl.report_period
+  on conflict (institution_id) do update
+  set
+    filing_id = excluded.filing_id,
+    report_period = excluded.report_period,
+    total_value_usd_thousands = excluded.total_value_usd_thousands,
+    refreshed_at = excluded.refreshed_at;
+  get diagnostics refreshed_institutions = row_count;
+
+  update public.enrichment_candidate_institutions ci
+  set canonical_rank = ranked.canonical_rank
+  from (
+    select
+      ci2.institution_id,
+      row_number() over (
+        order by ci2.total_value_usd_thousands desc, i.institution_name asc, i.id asc
+      ) as canonical_rank
+    from public.enrichment_candidate_institutions ci2
+    join public.institutions i on i.id = ci2.institution_id
+  ) ranked
+  where ranked.institution_id = ci.institution_id
+    and ranked.canonical_rank <> ci.canonical_rank;
+  get diagnostics reranked_institutions = row_count;
+
+  return jsonb_build_object(
+    'removed_institutions', removed_institutions,
+    'removed_holdings', removed_holdings,
+    'refreshed_institutions', refreshed_institutions,
+    'inserted_holdings', inserted_holdings,
+    'reranked_institutions', reranked_institutions,
+    'refreshed_at', now_utc
+  );
+end;
+$$;
+
+-- Clear rows the previous version left behind.
+
+select public.refresh_enrichment_candidate_snapshot();
+
+commit;